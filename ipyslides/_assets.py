@@ -0,0 +1,179 @@
+"""
+Content addressed store of images used in slides. Each image is kept once, keyed by hash of its content, and written
+to HTML as an SVG `<use>` of a `<symbol>`. Symbols are defined once per notebook view (a widget per image in LiveSlides)
+and once per exported file, so same logo or figure on many slides is stored, sent and exported only once.
+Images are shared only for content built inside slides (and logo), which are shown in view along with symbols. 
+Elsewhere (e.g. plain notebook output) or with `asset_store.enabled = False`, images are inlined as data URIs.
+"""
+import re
+import struct
+import base64
+from contextlib import contextmanager
+
+from ._cache import content_key
+
+
+_svg_root_re = re.compile(r'<svg\b([^>]*)>(.*)</svg>', flags = re.DOTALL)
+_attr_re = re.compile(r'([\w:-]+)\s*=\s*(["\'])(.*?)\2', flags = re.DOTALL)
+_length_re = re.compile(r'^\s*([\d.]+)\s*(px|pt)?\s*$')
+_ref_re = re.compile(r'<use href="#(asset-[0-9a-f]{16})"')
+_root_only = ('width', 'height', 'viewBox', 'xmlns', 'xmlns:xlink', 'version', 'x', 'y', 'id', 'class', 'preserveAspectRatio')
+
+def _image_size(data):
+    "Returns (width, height) in pixels from header of PNG, GIF or JPEG bytes, else tries PIL, None if unknown."
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and data[12:16] == b'IHDR':
+        return struct.unpack('>II', data[16:24])
+
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return struct.unpack('<HH', data[6:10])
+
+    if data[:2] == b'\xff\xd8': # JPEG, size is in start of frame marker
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker, length = data[i + 1], struct.unpack('>H', data[i + 2:i + 4])[0]
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                h, w = struct.unpack('>HH', data[i + 5:i + 9])
+                return w, h
+            i += 2 + length
+        return None
+
+    try:
+        from io import BytesIO
+        from PIL import Image
+        return Image.open(BytesIO(data)).size
+    except Exception:
+        return None
+
+def _svg_size(attrs):
+    "Returns viewBox of SVG root from its attributes, using width and height if viewBox is not given."
+    if 'viewBox' in attrs:
+        return attrs['viewBox']
+
+    w, h = [_length_re.match(attrs.get(k, '')) for k in ('width', 'height')]
+    if w and h:
+        return f'0 0 {w.group(1)} {h.group(1)}'
+
+
+class _AssetStore:
+    "Images keyed by hash of content. Use `asset_store.enabled = False` to inline images instead."
+    def __init__(self):
+        self._symbols = {} # id -> <symbol> HTML
+        self._observers = []
+        self._owners = {} # owner (slide, logo) -> set of ids referenced by its content
+        self._counts = {} # id -> number of owners referencing it
+        self._sharing = 0 # Depth of nested `sharing` contexts
+        self.enabled = True
+
+    def __repr__(self):
+        return f'AssetStore(assets = {len(self._symbols)}, nbytes = {sum(map(len, self._symbols.values()))}, enabled = {self.enabled})'
+
+    def __len__(self):
+        return len(self._symbols)
+
+    @property
+    def shared(self):
+        "True if images are written as references to symbols, i.e. inside `sharing` context while content of slides is built."
+        return self.enabled and self._sharing > 0
+
+    @contextmanager
+    def sharing(self):
+        "Images created inside this context are written as references to symbols. Owner of content should call `retain` after it."
+        self._sharing += 1
+        try:
+            yield
+        finally:
+            self._sharing -= 1
+
+    def observe(self, callback):
+        "Call `callback(symbols)` with dict of id -> <symbol> of all images whenever an image is added or removed, to be shown once in view."
+        self._observers.append(callback)
+        if self._symbols: # Images added before view
+            callback(dict(self._symbols))
+
+    def _notify(self):
+        for callback in self._observers:
+            callback(dict(self._symbols))
+
+    def _add(self, key, symbol):
+        _id = f'asset-{key[:16]}'
+        if _id not in self._symbols:
+            self._symbols[_id] = symbol.replace('__id__', _id)
+            self._notify()
+        return _id
+
+    @staticmethod
+    def refs(content):
+        "Set of image ids referenced in HTML content."
+        return set(_ref_re.findall(content))
+
+    def retain(self, owner, content):
+        """Record images referenced by HTML content of `owner` (e.g. a slide), replacing its previous content.
+        Images not referenced by any owner are removed when no content is being built. Returns set of removed ids."""
+        new, old = self.refs(content), self._owners.pop(owner, set())
+        if new:
+            self._owners[owner] = new
+        
+        for _id in new - old:
+            self._counts[_id] = self._counts.get(_id, 0) + 1
+        for _id in old - new:
+            self._counts[_id] -= 1
+            if not self._counts[_id]:
+                del self._counts[_id]
+        
+        if self._sharing: # Outer content is still being built and may use images not retained yet
+            return set()
+        
+        removed = set(self._symbols) - set(self._counts)
+        for _id in removed:
+            del self._symbols[_id]
+        if removed:
+            self._notify()
+        return removed
+
+    def image(self, data, mime, width = '100%'):
+        "Returns HTML referencing image from base64 `data` (str) of given `mime`, or None if it can't be shared."
+        if not self.shared or not mime.startswith('image/') or mime == 'image/svg+xml':
+            return None
+
+        size = _image_size(base64.b64decode(data))
+        if not size:
+            return None
+
+        w, h = size
+        _id = self._add(content_key(mime, data),
+            f'<symbol id="__id__" viewBox="0 0 {w} {h}"><image href="data:{mime};base64,{data}" width="{w}" height="{h}"/></symbol>')
+        return f'<svg class="Asset" viewBox="0 0 {w} {h}" width="{width}" style="height:auto;"><use href="#{_id}"/></svg>'
+
+    def svg(self, svg):
+        "Returns HTML referencing given SVG string, or None if it can't be shared."
+        match = _svg_root_re.search(svg) if self.shared else None
+        if not match:
+            return None
+
+        attrs = {k: v for k, _, v in _attr_re.findall(match.group(1))}
+        view_box = _svg_size(attrs)
+        if not view_box:
+            return None
+
+        presentation = ' '.join(f'{k}="{v}"' for k, v in attrs.items() if k not in _root_only) # fill, stroke, style etc.
+        _id = self._add(content_key('image/svg+xml', svg),
+            f'<symbol id="__id__" viewBox="{view_box}"><g {presentation}>{match.group(2)}</g></symbol>')
+        size = ' '.join(f'{k}="{attrs[k]}"' for k in ('width', 'height') if k in attrs)
+        return f'<svg class="Asset" viewBox="{view_box}" {size}><use href="#{_id}"/></svg>'
+
+    @staticmethod
+    def sprite(symbols):
+        "Hidden SVG holding given symbols."
+        return ('<svg xmlns="http://www.w3.org/2000/svg" aria-hidden="true" style="position:absolute;width:0;height:0;overflow:hidden;">'
+            + ''.join(symbols) + '</svg>')
+
+    def sprite_for(self, content):
+        "Hidden SVG with symbols of images referenced in content, to add once in exported HTML."
+        ids = dict.fromkeys(_ref_re.findall(content))
+        return self.sprite([self._symbols[i] for i in ids if i in self._symbols]) if ids else ''
+
+asset_store = _AssetStore()
+del _AssetStore # Make sure this is not used by user
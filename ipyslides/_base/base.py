@@ -1,11 +1,13 @@
 "Inherit LiveSlides class from here. It adds useful attributes and methods."
-import os, re, textwrap
+import os
 from .widgets import Widgets
 from .screenshot import ScreenShot
 from .navigation import Navigation
 from .settings import LayoutSettings
 from .notes import Notes
 from .export_html import _HhtmlExporter
+from ..extended_md import _prefetch_static
+from .._deck import parse_deck
 
 class BaseLiveSlides:
     def __init__(self):
@@ -75,7 +77,7 @@ class BaseLiveSlides:
         "Return source code of all slides created using `from_markdown` or `%%slide`."
         sources = []
         for slide in self[:]:
-            if slide._from_cell and slide._markdown:
+            if slide._from_cell and slide._frame:
                 sources.append(slide._get_source(name=f'Markdown: Slide {slide.label}'))
             elif slide._from_cell and slide._cell_code:
                 sources.append(slide._get_source(name=f'Python: Slide {slide.label}'))
@@ -119,7 +121,7 @@ class BaseLiveSlides:
             self.widgets.htmls.toast.value = ''
             self.notify(content = toast['func'](), **toast['kwargs'])
     
-    def from_markdown(self, start, file_or_str, trusted = False):
+    def from_markdown(self, start, file_or_str, trusted = False, processes = 0):
         """You can create slides from a markdown file or tex block as well. It creates slides start + (0,1,2,3...) in order.
         You should add more slides by higher number than the number of slides in the file/text, or it will overwrite.
         Slides separator should be --- (three dashes) in start of line.
@@ -159,6 +161,11 @@ class BaseLiveSlides:
             write_something()
         ```
         Starting from version 1.6.2, only those slides will be updated whose content is changed from last run of this function. This increases speed.
+        A slide (or frame) is skipped on rerun if its markdown and values of \{\{vars\}\} referenced in it are same as last time.
+        Slides referencing mutable values (lists, arrays, DataFrames etc.) are always rebuilt on rerun, as they may be changed in place.
+        Slides using \{\{var\}\} are rebuilt automatically after a cell reassigns `var` (in-place mutations are not tracked).
+        Use `processes = N` (or `True` for all cores) to convert static markdown (without \{\{vars\}\}, `python run`, citations and notes) 
+        and highlight code blocks in N parallel processes before building slides, useful for large decks. Dynamic content is still parsed on main thread.
         
         **New in 1.7.2**:     
         - You can add slides from text blocks/file with a start number. 
@@ -174,41 +181,24 @@ class BaseLiveSlides:
         if not isinstance(file_or_str, str): #check path later or it will throw error
             raise ValueError(f"file_or_str expects a makrdown file path(str) or text block, got {file_or_str!r}")
         
-        if not trusted:
-            try: # Try becuase long string will through error for path
-                os.path.isfile(file_or_str) # check if file exists then check code blocks
-                with open(file_or_str, 'r') as f:
-                    lines = f.readlines()
-            except:
-                lines = file_or_str.splitlines()
-                    
-            untrusted_lines = []
-            for i, line in enumerate(lines, start = 1):
-                if re.match(r'```python\s+run', line):
-                    untrusted_lines.append(i)
-            
-            if untrusted_lines:
-                raise Exception(f'Given file/text may contain unsafe code to be executed at lines: {untrusted_lines}'
-                    ' Verify code is safe and try again with argument `trusted = True`.'
-                    ' Never run files that you did not create yourself or not verified by you.')
-        
-        try:
-            if os.path.isfile(file_or_str):
-                with open(file_or_str, 'r') as f:
-                    chunks = _parse_markdown_text(f.read())
-            elif file_or_str.endswith('.md'): # File but does not exits
-                raise FileNotFoundError(f'File {file_or_str} does not exist.')
-            else:
-                chunks = _parse_markdown_text(file_or_str)
-        except:
-            chunks = _parse_markdown_text(file_or_str)
-        
-        for i,chunk in enumerate(chunks, start = start):
+        if '\n' not in file_or_str and file_or_str.endswith('.md') and not os.path.isfile(file_or_str):
+            raise FileNotFoundError(f'File {file_or_str} does not exist.')
+        
+        deck = parse_deck(file_or_str) # Single pass over file/text keeping offsets of slides, cached until file changes
+        if deck.untrusted_lines and not trusted:
+            raise Exception(f'Given file/text may contain unsafe code to be executed at lines: {list(deck.untrusted_lines)}'
+                ' Verify code is safe and try again with argument `trusted = True`.'
+                ' Never run files that you did not create yourself or not verified by you.')
+        
+        if processes: # Text of slides is read from file again by their offsets, one slide at a time
+            _prefetch_static((slide.text for slide in deck.slides), workers = None if processes is True else int(processes))
+        
+        for slide in deck.slides:
             # Must run under this to create frames with triple underscore (___)
-            self.shell.run_cell_magic('slide', f'{i} -m', chunk)
+            self.shell.run_cell_magic('slide', f'{start + slide.index} -m', slide.text)
         
         # Return refrence to slides for quick update
-        handles = [[self._slides_dict[key] for key in self._slides_dict.keys() if key.startswith(f'{i}')] for i in range(start, start + len(chunks))]
+        handles = [[self._slides_dict[key] for key in self._slides_dict.keys() if key.startswith(f'{i}')] for i in range(start, start + len(deck))]
         return tuple([h for handle in handles for h in handle]) # flatten list of lists
     
     
@@ -299,7 +289,7 @@ class BaseLiveSlides:
             members = ['alert','block', 'bokeh2html', 'capture_std', 'citations_html', 'cite',
                        'colored', 'cols', 'details', 'doc', 'enable_zoom', 'format_css', 'format_html', 'highlight',
                        'html', 'iframe', 'image', 'keep_format', 'notify', 'notify_later', 'plt2html', 'raw', 'rows',
-                       'set_dir', 'sig', 'svg', 'textbox', 'vspace', 'write_citations', 'set_slide_css']
+                       'set_dir', 'sig', 'svg', 'textbox', 'vspace', 'write_citations', 'set_slide_css', 'paginate', 'set_dataframe_options']
             self.doc(self, 'LiveSlides', members = members, itself = False).display()
             
         with self.slide(7):
@@ -350,17 +340,3 @@ class BaseLiveSlides:
         
         self._slideindex = 0 # Go to title
         return self
-
-
-def _parse_markdown_text(text_block):
-    "Parses a Markdown text block and returns text for title and each slide."
-    lines = textwrap.dedent(text_block).splitlines() # Remove overall indentation
-    breaks = [-1] # start, will add +1 next
-    for i,line in enumerate(lines):
-        if line and line.strip() =='---':
-            breaks.append(i)
-    breaks.append(len(lines)) # Last one
-    
-    ranges = [range(j+1,k) for j,k in zip(breaks[:-1],breaks[1:])]
-    return ['\n'.join(lines[x.start:x.stop]) for x in ranges]
-        
\ No newline at end of file
@@ -5,7 +5,8 @@ not by end user.
 import re
 import os
 from .export_template import doc_css, doc_html, slides_css
-from ..formatter import code_css
+from ..formatter import code_css, code_styles
+from .._assets import asset_store
 
 class _HhtmlExporter:
     # Should be used inside LiveSlides class only.
@@ -15,6 +16,11 @@ class _HhtmlExporter:
     def _htmlize(self, allow_non_html_repr = False, as_slides = False, **kwargs):
         "page_size, text_font, code_font, slide_number are in kwargs"
         content = ''
+        label = self.main._slidelabel
+        for item in self.main:
+            item._materialize() # Lazy slides which were never visited
+        self.main._slidelabel = label # Building slides moves to them
+        
         for item in self.main:
             _html = ''
             for out in item.contents:
@@ -38,6 +44,8 @@ class _HhtmlExporter:
                                 '__codefont__', f'"{kwargs.get("code_font","monospace")}"')
                         )
         __code_css__ = self.main.widgets.htmls.hilite.value if as_slides else code_css(color='var(--primary-fg)')
+        __code_css__ += code_styles.css_for(content) # Shared by code blocks with className in these slides
+        content = asset_store.sprite_for(content) + content # Images used in these slides, defined once
         
         return doc_html.replace(
             '__page_size__',kwargs.get('page_size','letter')).replace(
@@ -11,8 +11,10 @@ from IPython.utils.capture import capture_output
 from ipywidgets import Layout
 
 from ..formatter import fix_ipy_image, code_css
+from .._assets import asset_store
 from ..extended_md import parse_xmd
 from ..utils import set_dir, html, details
+from .. import utils as _utils
 from . import scripts, intro, styles
 
 class LayoutSettings:
@@ -83,10 +85,12 @@ class LayoutSettings:
     def set_logo(self,src,width=80,top=0,right=16):
         "`src` should be PNG/JPEG file name or SVG string. width,top,right are pixels, should be integer."
         if isinstance(src,str):
-            if '<svg' in src and '</svg>' in src:
-                image = src
-            else:
-                image = fix_ipy_image(Image(src,width=width),width=width) #width both in Image and its fixing
+            with asset_store.sharing(): # Logo is shown in view along with symbols
+                if '<svg' in src and '</svg>' in src:
+                    image = asset_store.svg(src) or src
+                else:
+                    image = fix_ipy_image(Image(src,width=width),width=width) #width both in Image and its fixing
+            asset_store.retain('logo', image)
 
             self.widgets.htmls.logo.value = f"""<div style='position:absolute;right:{right}px;top:{top}px;width:{width}px;height:auto;'>
                                         {image}</div>"""
@@ -107,6 +111,15 @@ class LayoutSettings:
         
         self.widgets.htmls.footer.value = _text.replace('__number__',_number_str)
         
+    def _content_px(self):
+        "Estimated width of slide content in CSS pixels, used to resize images to their display size."
+        slide = _utils._screen_px * self.width_slider.value / 100
+        if self._content_width.endswith('%'):
+            return slide * float(self._content_width[:-1]) / 100
+        elif self._content_width.endswith('px'):
+            return float(self._content_width[:-2])
+        return slide
+    
     def set_layout(self,center = True, content_width = None):
         "Central aligment of slide by default. If False, left-top aligned."
         self._content_width = content_width if content_width else self._content_width # user selected
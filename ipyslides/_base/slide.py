@@ -11,6 +11,7 @@ from IPython.utils.capture import capture_output
 
 from . import styles
 from ..utils import html, alert, raw
+from .._assets import asset_store
 
 class Slide:
     "New in 1.7.0"
@@ -30,12 +31,14 @@ class Slide:
         self.notes = '' # Should be update by Notes and LiveSlides calss
         self.set_overall_animation()
         self._animation = None
-        self._markdown = '' # Should be update by LiveSlides
+        self._frame = None # `Frame` of markdown of slide, should be update by LiveSlides
+        self._source_key = None # Digest of markdown and its {{vars}} values, should be update by LiveSlides
         self._cell_code = '' # Should be update by LiveSlides 
         self._from_cell = False # Update in build slides
         self._toast = None # Update from BaseLiveSlides
         self._has_widgets = False # Update in _build_slide function
         self._citations = {} # Added from LiveSlides
+        self._recipe = None # Function to build content of a lazy slide on first visit, set by LiveSlides
         
     def __repr__(self):
         md = f'{self.markdown[:15]}...' if self.markdown else ''
@@ -57,6 +60,14 @@ class Slide:
                 for citation in self._citations.values():
                     citation.html.display()
     
+    def _materialize(self):
+        "Build content of a lazy slide from its recipe if not built yet."
+        if self._recipe is not None:
+            recipe, self._recipe = self._recipe, None # Remove first, recipe rebuilds this slide
+            current = self._app._current_slide
+            recipe()
+            self._app._current_slide = current # Slide being written in notebook should not change
+    
     def clear_display(self, wait = False):
         "Clear display of this slide."
         self._app._slidelabel = self.label # Go there to see effects
@@ -132,7 +143,7 @@ class Slide:
     
     @property
     def markdown(self):
-        return getattr(self, '_markdown', '') # Not All Slides have markdown
+        return self._frame.text if self._frame else '' # Not All Slides have markdown
     
     @property
     def animation(self):
@@ -162,8 +173,8 @@ class Slide:
     def _get_source(self, name = None):
         if self._from_cell and self._cell_code:
             return self._app.source.from_string(self._cell_code, language = 'python', name = name)
-        elif self._from_cell and self._markdown:
-            return self._app.source.from_string(self._markdown, language = 'markdown', name = name)
+        elif self._from_cell and self._frame:
+            return self._app.source.from_string(self._frame.text, language = 'markdown', name = name)
         else:
             return self._app.source.from_string('Source of a slide only exits if it is created (most recently) using `from_markdown` or `%%slide` magic '
                 'and is **NOT overwritten** by `@LiveSlide.frames` or `with LiveSlides.slide` contextmanager.\n'
@@ -255,7 +266,7 @@ class Slide:
 @contextmanager
 def _build_slide(app, slide_number_str, props_dict = {}, from_cell = False):
     "Use as contextmanager in LiveSlides class to create slide. New in 1.7.0"
-    with capture_output() as captured:
+    with asset_store.sharing(), capture_output() as captured: # Images are kept once, as slides are shown in view with symbols
         if slide_number_str in app._slides_dict:
             _slide = app._slides_dict[slide_number_str]
         else:
@@ -267,10 +278,13 @@ def _build_slide(app, slide_number_str, props_dict = {}, from_cell = False):
         yield _slide
     
     _slide._from_cell = from_cell # Need to determine code source
+    _slide._source_key = None # Content is rebuilt, LiveSlides sets it again for markdown slides
+    _slide._recipe = None # Content is built now, LiveSlides sets it again for lazy slides
     if not from_cell:
         _slide._cell_code = '' # Clear cell code but not Markdown
         
     _slide._contents = captured.outputs
+    asset_store.retain(_slide, ''.join(out.data.get('text/html', '') for out in captured.outputs)) # Images not used anymore are removed
         
     app._slidelabel = _slide.label # Go there to see effects
     _slide.update_display() # Update Slide, it will not come to this point if has same code
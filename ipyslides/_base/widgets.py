@@ -59,6 +59,7 @@ class _Htmls:
     cursor  = HTML().add_class('LaserPointer') # For beautiful cursor
     notes   = HTML('Notes Area').add_class('Inline-Notes') # For below slides area
     hilite  = HTML() # Updated in settings on creation. For code blocks.
+    codes   = HTML() # Shared CSS of code blocks with className, updated by formatter.code_styles
     fscrn   = HTML() # Full Screen CSS, do not add here!
     zoom    = HTML() # zoom-container CSS, do not add here!
     capture = HTML('<span class="Info">Edit above box and hit Enter to see screenshot here. ' 
@@ -272,6 +273,10 @@ class Widgets:
             ],layout=Layout(width='auto',height='auto',overflow_y='scroll',padding='8px',margin='0'))
         ],layout = Layout(width='70%',min_width='50%',height='100%',overflow='hidden',display='none')).add_class('panel') 
         
+        self.assets = Box([
+            # Hidden SVG symbols of images are added here once, by formatter.asset_store
+        ],layout = Layout(width='0',height='0',overflow='hidden'))
+        
         self.slidebox = Box([
             # Slides are added here dynamically
         ],layout= Layout(min_width='100%',overflow='auto')).add_class('SlideBox') 
@@ -287,6 +292,8 @@ class Widgets:
             self.panelbox, 
             self.htmls.cursor,
             self.htmls.hilite,
+            self.htmls.codes,
+            self.assets,
             self.htmls.zoom,
             self.htmls.fscrn,
             HBox([ #Slide_box must be in a box to have animations work
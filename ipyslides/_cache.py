@@ -0,0 +1,112 @@
+"""
+Bounded caches used internally to avoid repeated parsing/highlighting/rendering of same content.
+"""
+import sys
+import hashlib
+from collections import OrderedDict
+
+
+def content_key(*parts):
+    "Returns a short hex digest for given parts (str/bytes or objects with stable repr) to use as cache key."
+    _hash = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, bytes):
+            _hash.update(part)
+        else:
+            _hash.update(str(part).encode('utf-8', 'surrogatepass'))
+        _hash.update(b'\x00') # Separator, so ('ab','c') != ('a','bc')
+    return _hash.hexdigest()
+
+def _sizeof(value):
+    "Approximate size in bytes of cached value."
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    "Least recently used cache with a byte budget. Oldest entries are evicted when budget is exceeded."
+    def __init__(self, name, max_bytes = 32 * 2**20):
+        self.name = name
+        self._max_bytes = max_bytes
+        self._data = OrderedDict() # key -> (value, nbytes)
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return (f'LRUCache(name = {self.name!r}, entries = {len(self._data)}, nbytes = {self._nbytes}, '
+            f'max_bytes = {self._max_bytes}, hits = {self.hits}, misses = {self.misses})')
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    @property
+    def stats(self):
+        "Dictionary of hits, misses, evictions and memory used."
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+            'entries': len(self._data), 'nbytes': self._nbytes, 'max_bytes': self._max_bytes}
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    def set_budget(self, max_bytes):
+        "Set memory budget in bytes, 0 disables caching. Extra entries are evicted immediately."
+        if not isinstance(max_bytes, int) or max_bytes < 0:
+            raise ValueError(f'max_bytes should be a non-negative integer, got {max_bytes!r}')
+        self._max_bytes = max_bytes
+        self._evict()
+
+    def get(self, key, default = None):
+        "Returns cached value for key and marks it recently used, else `default`."
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        "Store value for key. Values bigger than whole budget are not stored."
+        nbytes = _sizeof(value)
+        if nbytes > self._max_bytes:
+            return value
+
+        self.pop(key)
+        self._data[key] = (value, nbytes)
+        self._nbytes += nbytes
+        self._evict()
+        return value
+
+    def pop(self, key):
+        "Remove key from cache if exists."
+        if key in self._data:
+            _, nbytes = self._data.pop(key)
+            self._nbytes -= nbytes
+
+    def discard(self, predicate):
+        "Remove entries for which `predicate(key, value)` is True. Returns number of removed entries."
+        keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+        for key in keys:
+            self.pop(key)
+        return len(keys)
+
+    def clear(self):
+        "Remove all entries and reset statistics."
+        self._data.clear()
+        self._nbytes = 0
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def _evict(self):
+        while self._data and self._nbytes > self._max_bytes:
+            _, (_, nbytes) = self._data.popitem(last = False)
+            self._nbytes -= nbytes
+            self.evictions += 1
@@ -0,0 +1,226 @@
+"""
+Document model of markdown decks used by `LiveSlides.from_markdown`, `%%slide -m` and the markdown parser.
+
+A deck is read in a single streaming pass, which splits it into title and slides (---) and records line numbers of
+```python run blocks and byte offsets of each slide. Text of a slide is read back from its offsets only when it is needed,
+so a big deck is never held in memory as a whole. Decks of files are cached per path, size and modification time, which keeps only offsets.
+
+Text of a slide is split into frames (___), frames into markdown and ``` blocks and multicol blocks into columns (+++),
+with line ranges. These are cached per text, so building, change detection and parsing of a slide tokenize it only once.
+"""
+import os, io, re, mmap, textwrap
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+
+_run_re = re.compile(r'```python\s+run')
+_frame_sep_re = re.compile(r'^___$|^___\s+$', flags = re.MULTILINE) # ___ or ___\s+ on its own line
+_slide_syntax_re = re.compile(r'(?<![\w\`])(cite|notes|citations)\`(.*?)\`', flags = re.DOTALL)
+_MMAP_MIN_BYTES = 8 * 2**20 # Files bigger than this are memory-mapped instead of buffered reads
+
+@dataclass(frozen = True)
+class Block:
+    "Markdown text or ``` block of a frame. Lines are in text of frame, header and text of ``` blocks are without common indentation."
+    code: bool # False for markdown text between ``` blocks
+    kind: str # markdown for text, else multicol, python or language of code
+    header: str # Options and .classes after ```, empty for markdown text
+    text: str
+    start: int
+    end: int
+
+    @property
+    def runs(self):
+        "True for ```python run``` blocks, which are executed while building slides."
+        return self.kind == 'python' and 'run' in self.header.split('.', 1)[0]
+
+    @property
+    def columns(self):
+        "Text of columns of multicol block split at +++, else whole text as single column."
+        return tuple(self.text.split('+++')) if self.kind == 'multicol' else (self.text,)
+
+@dataclass(frozen = True)
+class Frame:
+    "Text of a frame, which includes markdown before first ___ of slide. Lines are of its own part in text of slide."
+    text: str
+    start: int
+    end: int
+
+    @property
+    def blocks(self):
+        "Tuple of `Block` of text."
+        return _blocks(self.text)
+
+    @property
+    def dynamic(self):
+        "True if output may change without text and {{vars}} changing, i.e. frame has ```python run``` blocks or citations`title` of all slides."
+        return any(b.runs or ((not b.code or b.kind == 'multicol') and _has_citations(b.text)) for b in self.blocks)
+
+@dataclass(frozen = True)
+class DeckSlide:
+    "Title (index 0) or a slide of a deck. Lines are in source file/text, offsets are bytes for file and characters for text."
+    index: int
+    start: int
+    end: int
+    offset: int
+    stop: int
+    _deck: 'Deck' = field(repr = False, compare = False)
+
+    @property
+    def text(self):
+        "Text of slide without overall indentation of deck, read from source each time."
+        return self._deck._read(self.offset, self.stop)
+
+    @property
+    def frames(self):
+        "Tuple of `Frame` of slide, lines are in text of slide."
+        return _frames(self.text)
+
+@dataclass(frozen = True)
+class Deck:
+    "Slides of a markdown file/text and line numbers of ```python run blocks."
+    source: str # Path of file or text
+    is_file: bool
+    stat: tuple # (size, mtime) of file when read
+    margin: int # Overall indentation removed from lines
+    untrusted_lines: tuple
+    slides: tuple = field(default = (), repr = False)
+
+    def __len__(self):
+        return len(self.slides)
+
+    def _read(self, offset, stop):
+        if not self.is_file:
+            text = self.source[offset:stop]
+        else:
+            with open(self.source, 'rb') as f:
+                if _stat(f.fileno()) != self.stat:
+                    raise Exception(f'File {self.source!r} is modified after it was read, read it again with from_markdown.')
+                f.seek(offset)
+                text = f.read(stop - offset).decode('utf-8')
+
+        lines = text.split('\n')
+        if text.endswith('\n'):
+            lines.pop() # Newline at end of last line
+        return '\n'.join(line.rstrip('\r')[self.margin:] if line.strip() else '' for line in lines)
+
+
+def _line(text, pos):
+    "Line number of position in text."
+    return text.count('\n', 0, pos) + 1
+
+def _has_citations(text):
+    return any(m.group(1) == 'citations' for m in _slide_syntax_re.finditer(text))
+
+def _block_kind(header):
+    line = header.split('.', 1)[0] # .classes are not part of kind
+    if 'multicol' in line:
+        return 'multicol'
+    elif 'python' in line:
+        return 'python'
+    return line.strip() or 'text'
+
+@lru_cache(maxsize = 1024)
+def _blocks(xmd):
+    "Returns tuple of `Block` of markdown text split at ```, markdown and code blocks alternate. Lines are in xmd."
+    line = 0 if xmd[:3] == '```' else 1 # Could be a block just in start of text, markdown before it is empty
+    sections = ('\n' + xmd if line == 0 else xmd).split('\n```') # This avoids nested blocks and it should be
+    blocks = []
+    for i, section in enumerate(sections):
+        end = line + section.count('\n')
+        if i % 2 == 0:
+            blocks.append(Block(False, 'markdown', '', section, line, end))
+        else:
+            header, _, text = textwrap.dedent(section).partition('\n') # Remove indentation in code block, useful to write examples inside markdown block
+            blocks.append(Block(True, _block_kind(header), header, text, line, end))
+        line = end + 1 # Newline before ``` is removed by split
+    return tuple(blocks)
+
+@lru_cache(maxsize = 1024)
+def _frames(xmd):
+    "Returns tuple of `Frame` of markdown text split at ___, content before first ___ is repeated on each frame."
+    seps = list(_frame_sep_re.finditer(xmd))
+    if not seps:
+        return (Frame(xmd, 1, _line(xmd, len(xmd))),)
+
+    head = xmd[:seps[0].start()]
+    bounds = [*(m.end() for m in seps), len(xmd)]
+    starts = [m.start() for m in seps[1:]] + [None]
+    frames = []
+    for a, b in zip(bounds[:-1], starts):
+        part = xmd[a:b]
+        end = _line(xmd, len(xmd)) if b is None else _line(xmd, b) - 1
+        frames.append(Frame(head + '\n' + part, _line(xmd, a) + 1, end))
+    return tuple(frames)
+
+def _stat(fd):
+    stat = os.fstat(fd)
+    return stat.st_size, stat.st_mtime_ns
+
+def _iter_lines(file_or_str, is_file):
+    "Yields (offset, line) from a markdown file or text block without making copies of whole text. Offsets are bytes for file, characters for text."
+    if not is_file:
+        offset = 0
+        for line in io.StringIO(file_or_str):
+            yield offset, line.rstrip('\r\n')
+            offset += len(line)
+        yield offset, None # End of text
+        return
+
+    with open(file_or_str, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= _MMAP_MIN_BYTES:
+            source = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        else:
+            source = f
+
+        try:
+            offset = 0
+            for raw in iter(source.readline, b''):
+                yield offset, raw.decode('utf-8').rstrip('\r\n')
+                offset += len(raw)
+            yield offset, None
+        finally:
+            if source is not f:
+                source.close()
+
+def _read_markdown(file_or_str, is_file):
+    """Yields (start, end, offset, stop, lines) of title and each slide split at --- as they are read, where start and end are
+    line numbers of first and last line and offset and stop are positions of slide in source."""
+    start, offset, lines = 1, 0, []
+    for i, (pos, line) in enumerate(_iter_lines(file_or_str, is_file), start = 1):
+        if line is None or (line and line.strip() == '---'):
+            yield start, i - 1, offset, pos, lines
+            start, lines = i + 1, []
+            offset = None # Set by next line
+        else:
+            if offset is None:
+                offset = pos
+            lines.append(line)
+
+def _deck(file_or_str, is_file = False, stat = None):
+    "Reads `Deck` in a single pass, keeping only positions of slides. Overall indentation is removed as in `textwrap.dedent`."
+    spans, untrusted_lines, margin = [], [], None
+    for start, end, offset, stop, lines in _read_markdown(file_or_str, is_file):
+        for i, line in enumerate(lines, start = start):
+            if _run_re.match(line):
+                untrusted_lines.append(i)
+
+            if line.strip():
+                indent = line[:len(line) - len(line.lstrip())]
+                margin = indent if margin is None else os.path.commonprefix([margin, indent])
+        spans.append((start, end, stop if offset is None else offset, stop))
+
+    deck = Deck(file_or_str, is_file, stat, len(margin or ''), tuple(untrusted_lines))
+    object.__setattr__(deck, 'slides', tuple(DeckSlide(i, *span, deck) for i, span in enumerate(spans))) # Slides refer back to deck
+    return deck
+
+@lru_cache(maxsize = 8)
+def _file_deck(path, size, mtime):
+    return _deck(path, is_file = True, stat = (size, mtime))
+
+def parse_deck(file_or_str):
+    "Returns `Deck` of a markdown file or text. Result for a file is reused until it is modified, text is read each time."
+    if '\n' not in file_or_str and os.path.isfile(file_or_str):
+        with open(file_or_str, 'rb') as f:
+            stat = _stat(f.fileno())
+        return _file_deck(os.path.abspath(file_or_str), *stat)
+    return _deck(file_or_str)
@@ -1,15 +1,17 @@
 from distutils.command.build import build
-import sys, re, textwrap
+import sys, textwrap
 from contextlib import contextmanager, suppress
 
 from IPython import get_ipython
 from IPython.display import display
 import ipywidgets as ipw
 
-from .extended_md import parse_xmd, _special_funcs, extender as _extender
+from .extended_md import parse_xmd, _parse_slide_xmd, _special_funcs, _source_key, _compile_template, extender as _extender, xmd_cache as _xmd_cache, run_cache as _run_cache, invalidate_run_cache, set_run_executor
 from .source import Source
 from .writers import write, iwrite
-from .formatter import bokeh2html, plt2html, highlight, _HTML, serializer
+from .formatter import bokeh2html, plt2html, highlight, _HTML, serializer, highlight_cache as _highlight_cache, figure_cache as _figure_cache, code_styles as _code_styles, set_dataframe_options
+from ._assets import asset_store as _asset_store
+from ._deck import _frames
 from . import utils
 
 _under_slides = {k:getattr(utils,k,None) for k in utils.__all__}
@@ -62,20 +64,43 @@ class LiveSlides(BaseLiveSlides):
         
         self.backtick = '&#96;'
         self.extender   = _extender
+        self.xmd_cache  = _xmd_cache # Parsed markdown fragments, use .stats, .set_budget, .clear
+        self.run_cache  = _run_cache # Outputs of ```python run``` blocks, disabled until .set_budget(nbytes), use .stats, .clear
+        self.invalidate_run_cache = invalidate_run_cache # Force running blocks which use given variables
+        self.set_run_executor = set_run_executor # exec or run_cell for python run blocks
         self.plt2html   = plt2html
+        self.set_dataframe_options = set_dataframe_options # Limits of DataFrames in write
         self.bokeh2html = bokeh2html
         self.highlight  = highlight
+        self.highlight_cache = _highlight_cache # Highlighted code, use .stats, .set_budget, .clear
+        self.figure_cache = _figure_cache # Rendered matplotlib figures, disabled until .set_budget(nbytes)
+        _code_styles.observe(lambda css: setattr(self.widgets.htmls.codes, 'value', css), displayed = lambda: self._displayed) # One stylesheet for all code blocks
+        self.widgets.htmls.codes.value = _code_styles.css
+        utils._content_px = self.settings._content_px # Images are resized to width of content
+        self.asset_store = _asset_store # Images in slides kept once by content, use .enabled = False to inline them
+        self._displayed = False # True while slides view is displayed, shared code CSS needs it
+        self._asset_widgets = {} # id -> hidden HTML widget with image symbol
+        _asset_store.observe(self.__show_assets)
         self.source = Source # Code source
         self.write  = write # Write IPython objects in slides
         self.iwrite = iwrite # Write Widgets/IPython in slides
         self.parse_xmd = parse_xmd # Parse extended markdown
         self.serializer = serializer # Serialize IPython objects to HTML
         
+        # Slide specific syntax in markdown: cite`key`, notes`text`, citations`title`, [key]:`value`
+        _extender._register_slide_syntax(
+            cite = self.cite,
+            notes = self.notes.insert,
+            citations = lambda title: self.citations_html(title = title).value,
+            set_citations = self.set_citations
+        )
+        
         with suppress(Exception): # Avoid error when using setuptools to install
             self.shell.register_magic_function(self.__slide, magic_kind='cell',magic_name='slide')
             self.shell.register_magic_function(self.__title, magic_kind='cell',magic_name='title')
             self.shell.register_magic_function(self.notes.insert, magic_kind='line',magic_name='notes')
             self.shell.register_magic_function(self.__xmd, magic_kind='line_cell',magic_name='xmd')
+            self.shell.events.register('post_run_cell', self.__refresh_markdown_slides) # Keep {{vars}} on slides up to date
             self.user_ns = self.shell.user_ns #important for set_dir
             
             # Override print function to display in order in slides
@@ -93,6 +118,11 @@ class LiveSlides(BaseLiveSlides):
         self._current_slide = '0' # Initialize current slide for notes at title page
         self._reverse_mapping = {'0':'0'} # display number -> input number of slide
         self._citations_dict = {} # Initialize citations dictionary, updated by user or by set_citations.
+        self._md_deps = {} # {{var}} name -> keys of markdown slides using it
+        self._md_vars = {} # {{var}} name -> its value when last rendered, kept alive so identity check is not fooled by reused ids
+        self._refreshing = False # True while markdown slides are being built or refreshed after a cell execution
+        self._lazy = False # Build slides from %%slide and from_markdown on first visit if True
+        self._hold_lazy = False # Do not build lazy slides while refreshing display of all slides
         self._iterable = [] #self._collect_slides() # Collect internally
         self._nslides =  0 # Real number of slides
         self._max_index = 0 # Maximum index including frames
@@ -166,6 +196,7 @@ class LiveSlides(BaseLiveSlides):
         ))
         
     def _on_displayed(self, change):
+        self._displayed = True
         self.widgets._exec_js(multi_slides_alert)
         if self._max_index == 0: # prevent overwrite
             with _build_slide(self, '0'):
@@ -213,6 +244,8 @@ class LiveSlides(BaseLiveSlides):
 
     def clear(self):
         "Clear all slides."
+        for slide in self._slides_dict.values():
+            _asset_store.retain(slide, '') # Images of deleted slides
         self._slides_dict = {} # Clear slides
         self.refresh() # Clear interface too
     
@@ -304,11 +337,28 @@ class LiveSlides(BaseLiveSlides):
         
         self.close_view() # Close previous views
         self._display_box_ = ipw.VBox(children=[self.__jlab_in_cell_display(), self._box]) # Initialize display box again
+        self._displayed = True
         return display(self._display_box_)
     
     def close_view(self):
         "Close all slides views, but keep slides in memory than can be shown again."
         self._display_box_.close() 
+        self._displayed = False # Content created now should not depend on view
+    
+    def __show_assets(self, symbols):
+        "Keep one hidden HTML widget per image symbol in view, slides refer to images by id."
+        removed = set(i for i in self._asset_widgets if i not in symbols)
+        for _id in removed:
+            self._asset_widgets.pop(_id).close()
+        
+        for _id, symbol in symbols.items():
+            if _id not in self._asset_widgets:
+                self._asset_widgets[_id] = ipw.HTML(_asset_store.sprite([symbol]))
+        
+        self.widgets.assets.children = tuple(self._asset_widgets.values())
+        if removed: # Cached HTML referring to removed images can not be reused
+            _xmd_cache.discard(lambda key, value: isinstance(value, str) and bool(removed & _asset_store.refs(value)))
+            _figure_cache.discard(lambda key, value: bool(removed & _asset_store.refs(value[0])))
     
     def __jlab_in_cell_display(self): 
         # Can test Voila here too
@@ -368,6 +418,9 @@ class LiveSlides(BaseLiveSlides):
         
     def _update_content(self,change):
         if self._iterable and change:
+            if not self._hold_lazy:
+                self._iterable[self._slideindex]._materialize() # Lazy slide is built on first visit
+            
             self.widgets.htmls.toast.value = '' # clear previous content of notification 
             self._display_toast() # or self.toasts._display_toast . Display in start is fine
             self.notes._display(self._slides_dict.get(self._access_key,None).notes) # Display notes first
@@ -397,10 +450,14 @@ class LiveSlides(BaseLiveSlides):
         # Update Slides
         #slides = [ipw.Output(layout=ipw.Layout(width = '0',margin='0')) for s in self._iterable]
         self.widgets.slidebox.children = [it._widget for it in self._iterable]
-        for i, s in enumerate(self._iterable):
-            s.update_display() 
-            s._index = i # Update index
-            self._slideindex = i # goto there to update display
+        self._hold_lazy = True
+        try:
+            for i, s in enumerate(self._iterable):
+                s.update_display() 
+                s._index = i # Update index
+                self._slideindex = i # goto there to update display
+        finally:
+            self._hold_lazy = False
         
         self._slideindex = 0 # goto first slide after refresh
             
@@ -414,7 +471,13 @@ class LiveSlides(BaseLiveSlides):
     def set_overall_animation(self, main = 'slide_h',frame = 'slide_v'):
         "Set animation for main and frame slides for all slides. For individual slides, use `self[index or key].set_animation/self.current.set_animation`"
         self._slides_dict[self._current_slide].set_overall_animation(main = main, frame = frame)
-    
+
+    def set_lazy(self, lazy = True):
+        """If lazy is True, slides created after this by `%%slide` and `from_markdown` are built on first visit (or export)
+        instead of at once, so loading of big presentations is bounded by slides actually shown.
+        Slides from `with slide` and `@frames` are always built at once."""
+        self._lazy = bool(lazy)
+
     # defining magics and context managers
     def __slide(self,line,cell):
         """Capture content of a cell as `slide`.
@@ -443,68 +506,110 @@ class LiveSlides(BaseLiveSlides):
         
         self._current_slide = line[0] # Works as a key for the _slides_dict
         
-        # NOTE: DO NOT bypass creating new slides with same old markdown, some varibale
-        #      may be changed in any of the cells.
-        
-        def resolve_objs(text_chunk):
-            # These objects should be only resolved under slide as they need slide reference
-            # cite`key`
-            all_matches = re.findall(r'cite\`(.*?)\`', text_chunk, flags = re.DOTALL)
-            for match in all_matches:
-                key = match.strip()
-                text_chunk = text_chunk.replace(f'cite`{match}`', self.cite(key), 1)
-            
-            # notes`This is a note for current slide`
-            all_matches = re.findall(r'notes\`(.*?)\`', text_chunk, flags = re.DOTALL)
-            for match in all_matches:
-                self.notes.insert(match)
-                text_chunk = text_chunk.replace(f'notes`{match}`', '', 1)
-            
-            # citations`This is citations title`
-            all_matches = re.findall(r'citations\`(.*?)\`', text_chunk, flags = re.DOTALL)
-            for match in all_matches:
-                citations = self.citations_html(title = match).value
-                text_chunk = text_chunk.replace(f'citations`{match}`', citations, 1)
-            
-            # [key]:`citation content`
-            all_matches = re.findall(r'\[(.*?)\]\:\`(.*?)\`', text_chunk, flags = re.DOTALL)
-            citations = {}
-            for match in all_matches:
-                citations[match[0].strip()] = match[1]
-                text_chunk = text_chunk.replace(f'[{match[0]}]:`{match[1]}`', '', 1)
-            
-            self.set_citations(citations)
-            return text_chunk
+        # NOTE: Slides with same old markdown are only skipped if values of {{vars}} in them are same as well,
+        #      as some variable may be changed in any of the cells.
         
         if '-m' in line[1:]:
-            _frames = re.split(r'^___$|^___\s+$',cell,flags = re.MULTILINE) # Split on --- or ---\s+
-            if len(_frames) > 1:
-                _frames = [_frames[0] + '\n' + obj for obj in _frames[1:]]
+            frames = _frames(cell) # Same objects as frames of a slide from `from_markdown` deck
                 
-            for i, obj in enumerate(_frames, start = 1):
-                if len(_frames) > 1: # Otherwise it's already been done
+            for i, frame in enumerate(frames, start = 1):
+                if len(frames) > 1: # Otherwise it's already been done
                     self._current_slide = f'{line[0]}.{i}'
-                    
-                with _build_slide(self, self._current_slide, from_cell = True) as s:
-                    chunk = resolve_objs(obj)
-                    s.clear_display(wait = True) # It piles up otherwise due to replacements
-                    parse_xmd(chunk, display_inline = True, rich_outputs = False) 
-                    
-                s._markdown = chunk # Update markdown after some replacements like cite`key`     
-                s._cell_code = '' # Reset cell code
+                
+                self.__build_markdown_slide(self._current_slide, frame, lazy = self._lazy)
                         
         else: # Run even if already exists as it is user choice in Notebook, unlike markdown which loads from file
             if '-s' in line[1:] and self._current_slide in self._slides_dict:
                 if self._slides_dict[self._current_slide]._cell_code == cell:
                     return # Do not run if cell is same as previous and -s is used
             
-            with _build_slide(self, self._current_slide, from_cell = True) as s:
-                self.shell.run_cell(cell)
-            
-            s._cell_code = cell # Update cell code
-            s._markdown = '' # Reset markdown
-                   
+            if self._lazy:
+                self.__defer_slide(self._current_slide, lambda key = self._current_slide: self.__build_code_slide(key, cell))
+                self._slides_dict[self._current_slide]._cell_code = cell # For -s check and source
+            else:
+                self.__build_code_slide(self._current_slide, cell)
     
+    def __build_code_slide(self, slide_key, cell):
+        "Build slide by running python code of cell."
+        self._current_slide = slide_key
+        with self.__hold_refresh(), _build_slide(self, slide_key, from_cell = True) as s:
+            self.shell.run_cell(cell)
+        
+        s._cell_code = cell # Update cell code
+        s._frame = None # Reset markdown
+    
+    @contextmanager
+    def __hold_refresh(self):
+        "Cells executed while building a slide (code of slide or python run blocks) should not refresh other slides."
+        refreshing, self._refreshing = self._refreshing, True
+        try:
+            yield
+        finally:
+            self._refreshing = refreshing
+    
+    def __defer_slide(self, slide_key, recipe):
+        "Create a placeholder slide which is built by calling recipe on first visit or export."
+        with _build_slide(self, slide_key, from_cell = True) as s:
+            utils.html('p', 'Slide will be built on first visit...', style = 'opacity:0.5;').display()
+        s._recipe = recipe # Should be after _build_slide which resets it
+                   
+    def __build_markdown_slide(self, slide_key, frame, lazy = False):
+        "Build slide/frame from a `Frame` of markdown, skipped if markdown and values of {{vars}} in it are not changed. If lazy, only a placeholder is created."
+        _slide = self._slides_dict.get(slide_key, None)
+        _key = _source_key(frame)
+        if _slide is not None and (_slide._source_key == _key or (_slide._recipe and _slide._frame == frame)):
+            return # Nothing changed, no need to parse and display again, lazy slide picks {{vars}} when visited
+        
+        if lazy:
+            self.__defer_slide(slide_key, lambda: self.__build_markdown_slide(slide_key, frame))
+            self._slides_dict[slide_key]._frame = frame
+            self._slides_dict[slide_key]._cell_code = ''
+            return
+        
+        self._current_slide = slide_key
+        with self.__hold_refresh(), _build_slide(self, slide_key, from_cell = True) as s:
+            s.clear_display(wait = True) # It piles up otherwise
+            _parse_slide_xmd(frame.text) # cite`key`, notes`text` etc. are resolved by parser only here, blocks are read from frame
+            
+        s._frame = frame # Update markdown
+        s._source_key = _key # Should be after _build_slide which resets it
+        s._cell_code = '' # Reset cell code
+        
+        # Index {{vars}} used in this slide to refresh it when they change
+        user_ns = self.shell.user_ns
+        for name in _compile_template(frame.text).names:
+            self._md_deps.setdefault(name, set()).add(slide_key)
+            self._md_vars[name] = user_ns.get(name, None)
+    
+    def __refresh_markdown_slides(self, result = None):
+        "Runs after each cell execution and rebuilds markdown slides whose {{vars}} are reassigned in that cell."
+        if self._refreshing or not self._md_vars:
+            return # Nested cell execution from `python run` blocks or nothing to watch
+        
+        user_ns = self.shell.user_ns
+        changed = [name for name, value in self._md_vars.items() if name in user_ns and user_ns[name] is not value]
+        if not changed:
+            return
+        
+        slide_keys = set(k for name in changed for k in self._md_deps.get(name, ()))
+        label, current = self._slidelabel, self._current_slide # Do not jump to refreshed slides
+        self._refreshing = True
+        try:
+            for key in sorted(slide_keys, key = lambda k: float(k)):
+                _slide = self._slides_dict.get(key, None)
+                if _slide is None or _slide._source_key is None: # Deleted or not a markdown slide anymore
+                    for name in changed:
+                        self._md_deps.get(name, set()).discard(key)
+                    continue
+                
+                self.__build_markdown_slide(key, _slide._frame)
+        finally:
+            self._refreshing = False
+            for name in changed:
+                self._md_vars[name] = user_ns[name]
+            self._current_slide = current
+            self._slidelabel = label
+        
     @contextmanager
     def slide(self,slide_number,props_dict = {}):
         """Use this context manager to generate any number of slides from a cell
@@ -20,16 +20,34 @@ Find special syntax to be used in markdown by `LiveSlides.xmd_syntax`.
 
 **New in 1.7.5**
 Use `LiveSlides.extender` or `ipyslides.extended_md.extender` to add [markdown extensions](https://python-markdown.github.io/extensions/).
+
+Parsed markdown is cached in `LiveSlides.xmd_cache` keyed on text, extensions and values of \{\{var\}\}, so unchanged content is not converted again.
+Use `xmd_cache.set_budget(nbytes)` to limit memory and `xmd_cache.stats` to see hits/misses.
+
+Outputs of ```python run``` blocks can be cached in `LiveSlides.run_cache` keyed on code and variables it reads, 
+so a block is not run again if it and its inputs are not changed. It is disabled by default, use `run_cache.set_budget(nbytes)` to enable.
+Mutable inputs (lists, arrays, DataFrames etc.) are compared by identity, so changing them in place is not detected, 
+use `LiveSlides.invalidate_run_cache(names)` to force running blocks which use given variables.
 """
 
-import textwrap, re
-from markdown import Markdown
+import os, ast, textwrap, re
+from contextlib import contextmanager
+from functools import lru_cache
+from xml.etree import ElementTree as etree
+from markdown import Markdown, util as md_util
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+from markdown.blockprocessors import BlockProcessor
+from markdown.inlinepatterns import InlineProcessor
 from IPython.core.display import display
 from IPython import get_ipython
 from IPython.utils.capture import capture_output
 
-from .formatter import _HTML, highlight, stringify
+from .formatter import _HTML, highlight, stringify, highlight_cache, _highlight, _highlight_args
 from .source import _str2code
+from ._cache import LRUCache, content_key
+from ._assets import asset_store
+from ._deck import _frames, _blocks, _slide_syntax_re
 
 
 _md_extensions = ['tables','footnotes','attr_list','md_in_html'] # For Markdown Parser
@@ -38,6 +56,7 @@ class PyMarkdown_Extender:
     def __init__(self):
         "Adds extensions to the Markdown parser. See [Website of Python-Markdown](https://python-markdown.github.io/extensions/)"
         self._exts = []
+        self._slide_handlers = {} # cite, notes, citations and set_citations, registered by LiveSlides
     
     def __repr__(self) -> str:
         return repr(self._all)
@@ -49,19 +68,37 @@ class PyMarkdown_Extender:
     def extend(self,extensions_list):
         "Add list of extensions to the Markdown parser."
         self._exts = list(set([*self._exts, *extensions_list]))
+        _parsers.clear() # Parsers with old extensions should not be reused
     
     def clear(self):
         "Clear all extensions added by user."
         self._exts = []
+        _parsers.clear()
     
     @property
     def active(self):
         "List of active extensions."
         return self._all
+    
+    @property
+    def parser_stats(self):
+        "Number of Markdown parsers constructed and reused from pool for active extensions."
+        return _parsers.stats
+    
+    def _register_slide_syntax(self, **handlers):
+        "Register functions for cite`key`, notes`text`, citations`title` and [key]:`value` syntax which need slides reference."
+        self._slide_handlers.update(handlers)
   
 extender = PyMarkdown_Extender()
 del PyMarkdown_Extender
 
+# Parsed markdown sections and multicol blocks, keyed on text after {{var}} substitution. Code blocks with `python run` are never cached.
+xmd_cache = LRUCache('Extended Markdown', max_bytes = 32 * 2**20)
+
+# Outputs and assigned variables of ```python run``` blocks, keyed on code and inputs it reads from user namespace.
+# Disabled by default, use `run_cache.set_budget(nbytes)` to enable.
+run_cache = LRUCache('Python Run Blocks', max_bytes = 0)
+
 _special_funcs = {
     'textbox':'text',
     'alert':'text',
@@ -71,13 +108,202 @@ _special_funcs = {
     'iframe':'src',
     'center':'text or \{\{variable\}\}'} # Center should be at end of all
 
+def _unstash(md, text):
+    "Put back html stored in parser's stash, so text can be passed to functions outside this parser."
+    return _placeholder_re.sub(lambda m: str(md.htmlStash.rawHtmlBlocks[int(m.group(1))]), text)
+
+_INNER = 'xmd-inner-text-f3a9' # Stands for text inside output of special functions
+
+def _wrapper(func):
+    "Returns element of output of `utils.func` with its text to be filled, or None if output is not a simple wrapper around text."
+    from . import utils # Inside function to avoid circular import
+    try:
+        root = etree.fromstring(getattr(utils, func)(_INNER).value)
+    except Exception:
+        return None
+    return root if root.text == _INNER and len(root) == 0 else None
+
+class _SpecialFuncProcessor(InlineProcessor):
+    """Handles alert`text`, image`path` etc. Text of alert, textbox and center stays markdown inside output of functions in `utils`,
+    others get their content unparsed. center`text` can contain others."""
+    def handleMatch(self, m, data):
+        from . import utils # Inside function to avoid circular import
+        func = m.group(1)
+        if func in ('alert', 'textbox', 'center'):
+            el = _wrapper(func)
+            if el is not None:
+                el.text = m.group(2) # Processed by next inline patterns, e.g. bold, links and nested functions
+                return el, m.start(0), m.end(0)
+        
+        text = _escape_re.sub(lambda e: e.group(1) if e.group(1) in self.md.ESCAPED_CHARS else e.group(0), m.group(2))
+        _out = getattr(utils, func)(_unstash(self.md, text)).value
+        return self.md.htmlStash.store(_out), m.start(0), m.end(0)
+
+class _SlideSyntaxProcessor(InlineProcessor):
+    "Handles cite`key`, notes`text` and citations`title` while building slides, if LiveSlides registered a handler for them."
+    def handleMatch(self, m, data):
+        self.md._has_side_effects = True # Output depends on slides or is left as text outside slides, so should not be cached
+        handler = extender._slide_handlers.get(m.group(1), None) if self.md._slide_syntax else None
+        if handler is None:
+            return None, None, None # Leave text as it is
+        
+        _out = handler(_unstash(self.md, m.group(2)).strip() if m.group(1) == 'cite' else _unstash(self.md, m.group(2)))
+        return self.md.htmlStash.store(_out or ''), m.start(0), m.end(0) # notes return None
+    
+class _DeferredHtmlPreprocessor(Preprocessor):
+    """Puts HTML of {{var}} objects in parser's stash, so it is not parsed as markdown.
+    Runs after Markdown strips control characters of stash placeholders from input text."""
+    def run(self, lines):
+        if not self.md._deferred_html or not any(_DEFERRED_START in line for line in lines):
+            return lines
+        
+        _lines = []
+        for line in lines:
+            match = _deferred_re.fullmatch(line.strip())
+            html = self.md._deferred_html[int(match.group(1))] if match else ''
+            if match and self.md.is_block_level(_first_tag(html)):
+                _lines.extend(['', self.md.htmlStash.store(html), '']) # Separate block, so not wrapped in a paragraph
+            else:
+                _lines.append(_deferred_re.sub(lambda m: self.md.htmlStash.store(self.md._deferred_html[int(m.group(1))]), line))
+        return _lines
+
+class _CitationsPreprocessor(Preprocessor):
+    "Collects and removes [key]:`citation content` from text before anything else is parsed."
+    def run(self, lines):
+        handler = extender._slide_handlers.get('set_citations', None) if self.md._slide_syntax else None
+        text = '\n'.join(lines)
+        if ']:`' not in text:
+            return lines
+        
+        if handler is None:
+            self.md._has_side_effects = True # Left as text outside slides, but same text is removed in slides
+            return lines
+        
+        citations = {}
+        def _collect(m):
+            citations[m.group(1).strip()] = m.group(2)
+            return ''
+        
+        text = _citation_def_re.sub(_collect, text)
+        if citations:
+            self.md._has_side_effects = True
+            handler(citations)
+        return text.split('\n')
+
+class _InlineColumnsProcessor(BlockProcessor):
+    "Handles ||Column A||Column B||, columns may contain any markdown and span multiple blocks."
+    def test(self, parent, block):
+        return '||' in block
+    
+    def run(self, parent, blocks):
+        count = 0 
+        for n, block in enumerate(blocks, start = 1): # Join minimum blocks which contain three ||
+            count += block.count('||')
+            if count >= 3:
+                break
+        
+        text = '\n\n'.join(blocks[:n])
+        match = _cols_re.search(text)
+        if match is None:
+            return False # Let other processors handle it
+        
+        del blocks[:n]
+        before, after = text[:match.start()], text[match.end():]
+        if before.strip():
+            self.parser.parseChunk(parent, before.rstrip())
+        
+        cols = etree.SubElement(parent, 'div')
+        cols.set('class', 'columns')
+        for col in match.groups():
+            _col = etree.SubElement(cols, 'div')
+            _col.set('style', 'width:50%;')
+            self.parser.parseChunk(_col, col)
+        
+        if after.strip():
+            blocks.insert(0, after)
+            
+class _ClassBlockProcessor(BlockProcessor):
+    "Handles class`name` ... ^^^ to wrap markdown in a div with given CSS classes, can be nested."
+    def test(self, parent, block):
+        return 'class`' in block and _class_re.search(block)
+    
+    def run(self, parent, blocks):
+        text = '\n\n'.join(blocks)
+        start = _class_re.search(text)
+        depth, end = 0, None
+        for m in _class_tokens_re.finditer(text, start.start()):
+            depth += 1 if m.group(1) is not None else -1
+            if depth == 0:
+                end = m
+                break
+        
+        before = text[:start.start()]
+        inner = text[start.end():end.start()] if end else text[start.end():] # Unclosed block takes all content
+        after = text[end.end():] if end else ''
+        
+        if before.strip():
+            self.parser.parseChunk(parent, before.rstrip())
+        
+        div = etree.SubElement(parent, 'div')
+        div.set('class', start.group(1))
+        self.parser.parseChunk(div, inner)
+        blocks[:] = [b for b in after.split('\n\n') if b.strip()]
+
+class _XMDExtension(Extension):
+    "Extended markdown syntax as Python-Markdown processors, so text is tokenized once by Markdown itself."
+    def extendMarkdown(self, md):
+        md._has_side_effects = False
+        md._slide_syntax = False
+        md._deferred_html = []
+        md.preprocessors.register(_DeferredHtmlPreprocessor(md), 'xmd_deferred_html', 29) # After normalize_whitespace
+        md.preprocessors.register(_CitationsPreprocessor(md), 'xmd_citations', 25)
+        md.parser.blockprocessors.register(_ClassBlockProcessor(md.parser), 'xmd_class_block', 79) # before tables, after code
+        md.parser.blockprocessors.register(_InlineColumnsProcessor(md.parser), 'xmd_inline_cols', 78)
+        # Before backtick, so that content between backticks is not converted to code
+        md.inlinePatterns.register(_SpecialFuncProcessor(_center_re.pattern, md), 'xmd_center', 202)
+        md.inlinePatterns.register(_SpecialFuncProcessor(_funcs_re.pattern, md), 'xmd_funcs', 201)
+        md.inlinePatterns.register(_SlideSyntaxProcessor(_slide_syntax_re.pattern, md), 'xmd_slide_syntax', 200)
+
+_placeholder_re = re.compile(md_util.HTML_PLACEHOLDER % r'([0-9]+)')
+_DEFERRED_START = '\x1axmd-html:'
+_deferred_re = re.compile(r'\x1axmd-html:([0-9]+)\x1a')
+_tag_re = re.compile(r'^\s*<([a-zA-Z][^\s>/]*)')
+
+def _first_tag(html):
+    "Name of first tag in html or empty string."
+    match = _tag_re.match(html)
+    return match.group(1).lower() if match else ''
+
+_var_re = re.compile(r'\{\{(.*?)\}\}', flags = re.DOTALL)
+_escape_re = re.compile(r'\\(.)')
+_funcs_re = re.compile('(?<![\\w\\`])({})\`(.*?)\`'.format('|'.join(k for k in _special_funcs if k != 'center')), flags = re.DOTALL)
+_center_re = re.compile(r'(?<![\w\`])(center)\`((?:\w+\`[^\`]*\`|[^\`])*?)\`', flags = re.DOTALL) # Allows one level of nested func`text`
+_citation_def_re = re.compile(r'\[([^\[\]]*?)\]\:\`(.*?)\`', flags = re.DOTALL)
+_cols_re = re.compile(r'\|\|(.*?)\|\|(.*?)\|\|', flags = re.DOTALL)
+_class_re = re.compile(r'class\`(.*?)\`', flags = re.DOTALL)
+_class_tokens_re = re.compile(r'class\`(.*?)\`|^\^\^\^$', flags = re.DOTALL | re.MULTILINE)
+
 class _ExtendedMarkdown(Markdown):
     "New in 1.4.5"
     def __init__(self):
-        super().__init__(extensions = extender._all)
+        super().__init__(extensions = [*extender._all, _XMDExtension()])
         self._display_inline = False
     
-    def _extract_class(self, header):
+    def reset(self):
+        "Reset parser state so that it can be reused for a new document."
+        self._display_inline = False
+        self._slide_syntax = False # cite`key`, notes`text` etc. are resolved only while building slides
+        self._has_side_effects = False
+        self._deferred_html = []
+        return super().reset()
+    
+    def _defer_html(self, html):
+        "Keep html aside and return a token for it, which is put in stash after Markdown preprocessing."
+        self._deferred_html.append(html)
+        return f'{_DEFERRED_START}{len(self._deferred_html) - 1}\x1a'
+    
+    @staticmethod
+    def _extract_class(header):
         out = header.split('.',1) # Can have many classes there
         if len(out) == 1:
             return out[0].strip(), ''
@@ -92,18 +318,13 @@ class _ExtendedMarkdown(Markdown):
         New in 1.4.5
         """
         self._display_inline = display_inline # Must change here
-        if xmd[:3] == '```': # Could be a block just in start of file or string
-            xmd = '\n' + xmd
-            
-        new_strs = xmd.split('\n```') # This avoids nested blocks and it should be
         outputs =[]
-        for i, section in enumerate(new_strs):
-            if i % 2 == 0:
-                out = self.convert(self._sub_vars(section))
+        for block in _blocks(xmd): # Markdown and code blocks alternate
+            if not block.code:
+                out = self._cached('markdown', block.text, lambda fill: self.convert(fill(block.text)))
                 outputs.append(_HTML(out))
             else:
-                _section = textwrap.dedent(section) # Remove indentation in code block, useuful to write examples inside markdown block
-                outputs.extend(self._parse_block(_section)) # vars are substituted already inside
+                outputs.extend(self._parse_block(block)) # vars are substituted already inside
         
         if rich_outputs:
             return outputs
@@ -119,22 +340,20 @@ class _ExtendedMarkdown(Markdown):
             return content
     
     def _parse_block(self, block):
-        "Returns list of parsed block or columns or code, input is without ``` but includes langauge name."
-        header, data = block.split('\n',1)
-        line, _class = self._extract_class(header)
-        if 'multicol' in line:
-            return [_HTML(self._parse_multicol(data, line, _class)),]
-        elif 'python' in line:
-            return self._parse_python(data, line, _class) # itself list
+        "Returns list of parsed block or columns or code from a `Block` of code."
+        line, _class = self._extract_class(block.header)
+        if block.kind == 'multicol':
+            return [_HTML(self._cached(block.header, block.text, lambda fill: self._parse_multicol([fill(col) for col in block.columns], line, _class))),]
+        elif block.kind == 'python':
+            return self._parse_python(block.text, line, _class) # itself list
         else:
-            language = line.strip() if line.strip() else 'text' # If no language, assume
+            language = block.kind # text if no language
             name = ' ' if language == 'text' else None # If no language or text, don't show name
-            return [highlight(data,language = language, name = name, className = _class),] # no need to highlight with className separately     
+            return [highlight(block.text,language = language, name = name, className = _class),] # no need to highlight with className separately     
         
-    def _parse_multicol(self, data, header, _class):
-        "Returns parsed block or columns or code, input is without \`\`\` but includes langauge name."
-        cols = data.split('+++') # Split by columns
-        cols = [self.convert(self._sub_vars(col)) for col in cols] 
+    def _parse_multicol(self, cols, header, _class):
+        "Returns parsed columns, given text of columns with {{vars}} substituted, and header without \`\`\`."
+        cols = [self.convert(col) for col in cols]
         if len(cols) == 1:
             return f'<div class={_class}">{cols[0]}</div>' if _class else cols[0]
         
@@ -157,6 +376,24 @@ class _ExtendedMarkdown(Markdown):
         
         return f'<div class="columns {_class}">{cols}\n</div>'
     
+    def _cached(self, kind, text, func):
+        """Returns `func(fill)` from cache if same text with same {{var}} values is parsed before with active extensions,
+        where `fill(part)` substitutes {{vars}} in text or a part of it (e.g. a column) with values resolved once."""
+        template = _compile_template(text)
+        values = template.values(get_ipython().user_ns) # Resolved values are part of key
+        key = _cache_key(kind, text, values)
+        out = xmd_cache.get(key)
+        if out is None:
+            self._has_side_effects = False
+            resolved = dict(zip(template.names, values))
+            def fill(part):
+                _template = _compile_template(part)
+                return _template.fill([resolved[name] for name in _template.names], store = self._defer_html)
+            out = func(fill)
+            if not self._has_side_effects: # Citations, notes etc. need to run each time
+                xmd_cache.put(key, out)
+        return out
+        
     def _parse_python(self, data, header, _class):
         # if inside some writing command, do not run code at all
         shell = get_ipython()
@@ -171,53 +408,337 @@ class _ExtendedMarkdown(Markdown):
             
             if source:
                 shell.user_ns[source] = _source_out 
-            # Run Code now
-            with capture_output() as captured:
-                shell.run_cell(dedent_data) # Run after assigning it to variable, so can be accessed inside code too
-            return captured.outputs
-        
-    def _sub_vars(self, html_output):
-        "Substitute variables in html_output given as {{var}} and two inline columns as ||C1||C2||"
-            
-        # Replace variables first 
-        user_ns = get_ipython().user_ns
-        all_matches = re.findall(r'\{\{(.*?)\}\}', html_output, flags = re.DOTALL)
-        for match in all_matches:
-            output = match # If below fails, it will be the same as input line
-            _match = match.strip()
-            if _match in user_ns:
-                output = user_ns[_match]
-            else:
+            return _run_cached(shell, dedent_data, exclude = [source])
+
+
+class _Template:
+    "Markdown text compiled to literal parts and {{var}} placeholders, rendered against a namespace in a single pass."
+    def __init__(self, text):
+        parts = _var_re.split(text) # Even indices are literal text, odd are variable names
+        self._literals = tuple(parts[::2])
+        self._names = tuple(name.strip() for name in parts[1::2])
+    
+    def __repr__(self):
+        return f'Template(names = {self._names!r})'
+    
+    @property
+    def names(self):
+        "Names of variables referenced in template."
+        return self._names
+    
+    def values(self, user_ns, strict = True):
+        """Returns list of (is_html, text) for each variable in template. Strings are kept as markdown, other objects are converted to HTML.
+        If `strict = False`, missing variables give (None, name) instead of raising error."""
+        _values = []
+        for name in self._names:
+            if name not in user_ns and not strict:
+                _values.append((None, name)) # May be defined later by a python run block
+                continue
+            if name not in user_ns:
                 raise ValueError(('{!r} is not found or expression is not executable. ' 
                 'Only variables and special syntax is allowed: (See LiveSlides.xmd_syntax for details)\n'
-                '{}').format(_match,'\n'.join(f'{k}:{v}:' for k,v in _special_funcs.items())))
-                
-            _out = (stringify(output) if output is not None else '') if not isinstance(output, str) else output # Avoid None
-            html_output = html_output.replace('{{' + match + '}}', _out, 1)
-        
-        # Replace inline one argumnet functions
-        from . import utils # Inside function to avoid circular import
-        for func in _special_funcs.keys():
-            all_matches = re.findall(fr'{func}\`(.*?)\`', html_output, flags = re.DOTALL)
-            for match in all_matches:
-                _out = getattr(utils,func)(match).value
-                html_output = html_output.replace(f'{func}`{match}`', _out, 1)
+                '{}').format(name,'\n'.join(f'{k}:{v}:' for k,v in _special_funcs.items())))
+            
+            output = user_ns[name]
+            if isinstance(output, str):
+                _values.append((False, output))
+            else:
+                _values.append((True, stringify(output) if output is not None else '')) # Avoid None
+        return _values
+    
+    def fill(self, values, store = None):
+        "Return text with placeholders replaced by `values`. If `store` is given, HTML values are passed through it (e.g. Markdown's htmlStash.store)."
+        if not self._names:
+            return self._literals[0]
         
-        # Replace columns after vars, so not to format their brackets
-        all_cols = re.findall(r'\|\|(.*?)\|\|(.*?)\|\|', html_output, flags = re.DOTALL) # Matches new line as well, useful for inline plots and big objects
-        for cols in all_cols:
-            _cols = ''.join(f'<div style="width:50%;">{self.convert(c)}</div>' for c in cols)
-            _out = f'<div class="columns">{_cols}</div>'
-            html_output = html_output.replace(f'||{cols[0]}||{cols[1]}||', _out, 1)
-              
-        # Replace Block classes
-        all_matches = re.findall(r'class\`(.*?)\`', html_output, flags = re.DOTALL)
-        for match in all_matches:
-            html_output = html_output.replace(f'class`{match}`', f'<div class="{match}" markdown="1">', 1)
+        out = [self._literals[0]]
+        for (is_html, value), literal in zip(values, self._literals[1:]):
+            out.append(store(value) if (is_html and store and value) else value)
+            out.append(literal)
+        return ''.join(out)
+    
+    def render(self, user_ns, store = None):
+        "Return text with {{var}} replaced by value of var from user_ns."
+        return self.fill(self.values(user_ns), store = store)
+
+@lru_cache(maxsize = 1024)
+def _compile_template(text):
+    "Returns cached `_Template` for given text, so regex work is not repeated on re-rendering."
+    return _Template(text)
+
+class _SourceKey:
+    """Markdown text of a `Frame` and current values of immutable {{vars}} referenced in it. Same key means same rendered output.
+    Frames referencing mutable values (which may be changed in place) or dynamic content (`python run` blocks, citations`title`)
+    never compare equal, as their output depends on more than text and names."""
+    __slots__ = ('_digest',)
+    
+    def __init__(self, frame, user_ns):
+        values = []
+        for name in _compile_template(frame.text).names:
+            if name not in user_ns:
+                values.append((name,)) # May be created by python run blocks in same xmd
+                continue
+            value = _fingerprint(user_ns[name])
+            if value is None:
+                values = None # Mutable, always rebuild
+                break
+            values.append((name, value))
         
-        html_output = re.sub(r'^\^\^\^$', '</div>', html_output,flags=re.MULTILINE) # Close last block
-        return html_output # return in main scope
+        self._digest = None if (frame.dynamic or values is None) else content_key(frame.text, *values)
+    
+    def __eq__(self, other):
+        return isinstance(other, _SourceKey) and self._digest is not None and self._digest == other._digest
+    
+    __hash__ = None
+
+def _source_key(frame):
+    "Returns `_SourceKey` of a `Frame` in current user namespace, without converting values of {{vars}} to HTML."
+    return _SourceKey(frame, get_ipython().user_ns)
+
+def _fingerprint(obj):
+    "Value of immutable builtin objects, None for others."
+    if isinstance(obj, (str, bytes, int, float, complex, bool, type(None))):
+        return repr(obj)
+    if isinstance(obj, (tuple, frozenset)):
+        parts = [_fingerprint(o) for o in obj]
+        if None not in parts:
+            return f'{type(obj).__name__}({",".join(parts)})'
+    return None
+
+@lru_cache(maxsize = 256)
+def _code_names(code):
+    "Returns (reads, writes) names of python code, or None if code could not be parsed."
+    try:
+        tree = ast.parse(get_ipython().transform_cell(code)) # Transform magics to python
+    except SyntaxError:
+        return None
+    
+    reads, writes = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (reads if isinstance(node.ctx, ast.Load) else writes).add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            writes.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            writes.update((alias.asname or alias.name).split('.')[0] for alias in node.names if alias.name != '*')
+    return frozenset(reads - writes), frozenset(writes) # Names assigned in code are its outputs, not inputs
+
+_run_options = {'executor': 'exec'} # 'exec' or 'run_cell'
+_magic_re = re.compile(r'^\s*[%!]|=\s*[%!]', flags = re.MULTILINE)
+
+def set_run_executor(executor = 'exec'):
+    """Set how ```python run``` blocks are executed. `'exec'` (default) compiles code of a block once and executes it in 
+    user namespace, `'run_cell'` runs it as a full IPython cell with history, execution count and pre/post run events."""
+    if executor not in ('exec', 'run_cell'):
+        raise ValueError(f"executor should be one of 'exec' or 'run_cell', got {executor!r}")
+    _run_options['executor'] = executor
+
+@lru_cache(maxsize = 256)
+def _compile_block(code):
+    "Returns compiled (body, last_expression) of code, magics are transformed to python if present. Last expression is displayed like in a cell."
+    shell = get_ipython()
+    source = shell.transform_cell(code) if _magic_re.search(code) else code
+    filename = shell.compile.cache(source, number = shell.execution_count, raw_code = code) # Source is in linecache for tracebacks and source.context
+    tree = ast.parse(source, filename = filename)
+    last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+    body = compile(tree, filename, 'exec')
+    last = compile(ast.Interactive([last]), filename, 'single') if last else None
+    return body, last
+
+def _execute(shell, code):
+    "Execute code in user namespace with executor set by `set_run_executor` and returns True if successful."
+    if _run_options['executor'] == 'run_cell':
+        return shell.run_cell(code).success
+    
+    try:
+        body, last = _compile_block(code)
+        exec(body, shell.user_ns)
+        if last:
+            exec(last, shell.user_ns) # Goes to displayhook
+    except Exception:
+        shell.showtraceback()
+        return False
+    return True
+
+def _run_cached(shell, code, exclude = ()):
+    """Run code in shell and return captured outputs. If same code was run before with same inputs it reads from user namespace,
+    outputs are replayed and variables assigned by code are restored from `run_cache` without running again."""
+    names = _code_names(code)
+    if names is None or run_cache.max_bytes == 0:
+        with capture_output() as captured:
+            _execute(shell, code)
+        return captured.outputs
+    
+    reads, writes = names
+    user_ns = shell.user_ns
+    inputs, refs = [], {} # Mutable inputs are kept in entry and compared with `is`, as id of a deleted object can be reused
+    for name in sorted(reads):
+        if name in user_ns and name not in exclude:
+            value = _fingerprint(user_ns[name])
+            if value is None:
+                refs[name] = user_ns[name]
+            inputs.append((name, value))
+    
+    key = content_key('python run', code, *inputs)
+    cached = run_cache.get(key)
+    if cached is not None and all(user_ns.get(name) is obj for name, obj in cached[4].items()):
+        outputs, assigned, *_ = cached
+        user_ns.update(assigned)
+        return list(outputs)
+    
+    with capture_output() as captured:
+        success = _execute(shell, code)
+    
+    if success:
+        assigned = {name: user_ns[name] for name in writes if name in user_ns}
+        run_cache.put(key, (tuple(captured.outputs), assigned, reads, writes, refs))
+    return captured.outputs
+
+def invalidate_run_cache(names = None):
+    """Remove cached results of ```python run``` blocks which read or assign any of given variable names, 
+    or all if names is None. Returns number of removed entries."""
+    if names is None:
+        count = len(run_cache)
+        run_cache.clear()
+        return count
+    
+    names = set([names] if isinstance(names, str) else names)
+    return run_cache.discard(lambda key, value: bool(names & (value[2] | value[3])))
+
+def _cache_key(kind, text, values = ()):
+    "Key of parsed `kind` of block in `xmd_cache` for given text, active extensions, resolved values of {{vars}} and whether images are shared."
+    return content_key(kind, sorted(extender._all), asset_store.shared, text, *values)
+
+def _static_sections(frame):
+    "Yields markdown blocks (outside code blocks) of a `Frame` which are pure functions of text, i.e. without {{vars}}, citations and notes."
+    for block in frame.blocks:
+        if block.code or _var_re.search(block.text) or _slide_syntax_re.search(block.text) or _citation_def_re.search(block.text):
+            continue
+        yield block.text
+
+def _static_code(frame):
+    "Yields arguments of `_highlight` for code blocks of a `Frame` which are only highlighted by parser, i.e. not multicol or python run."
+    for block in frame.blocks:
+        if not block.code or block.kind == 'multicol':
+            continue
+        line, _class = _ExtendedMarkdown._extract_class(block.header)
+        if block.kind == 'python':
+            if line.lower() == 'python': # Same as in _parse_python
+                yield _highlight_args(textwrap.dedent(block.text), language = 'python', className = _class)
+        else:
+            yield _highlight_args(block.text, language = block.kind, name = ' ' if block.kind == 'text' else None, className = _class)
+
+def _convert_static(extensions, sections, codes):
+    """Runs in a worker process. Returns list of (section, html) for sections converted without side effects
+    and list of highlighted HTML (None if failed) for codes given as arguments of `_highlight`."""
+    extender._exts = list(extensions)
+    out = []
+    with _parsers.parser() as _parser:
+        for section in sections:
+            _parser.reset()
+            html = _parser.convert(section)
+            if not _parser._has_side_effects and not _parser._deferred_html:
+                out.append((section, html))
+    
+    highlighted = []
+    for args in codes:
+        try:
+            highlighted.append(_highlight(*args))
+        except Exception: # e.g. unknown language, raised on main thread while building slide
+            highlighted.append(None)
+    return out, highlighted
+
+def _prefetch_static(xmds, workers = None, min_sections = 16):
+    """Convert static markdown sections and highlight code blocks of given iterable of xmd texts in a process pool and put 
+    results in `xmd_cache` and `highlight_cache`, so that building slides from them later on main thread only picks HTML from cache. 
+    Dynamic content ({{vars}}, `python run`, citations, notes) is left for main thread. Returns number of sections and code blocks converted."""
+    from concurrent.futures import ProcessPoolExecutor
+    
+    sections, codes = {}, {} # section -> key, key -> arguments of _highlight, dicts drop duplicates and keep order
+    for xmd in xmds:
+        for frame in _frames(xmd):
+            for section in _static_sections(frame):
+                if section not in sections:
+                    key = _cache_key('markdown', section)
+                    if key not in xmd_cache:
+                        sections[section] = key
+            
+            for args in _static_code(frame):
+                key = content_key(*args)
+                if key not in codes and key not in highlight_cache:
+                    codes[key] = args
+    
+    if len(sections) + len(codes) < min_sections: # Not worth starting processes
+        return 0
+    
+    workers = workers or os.cpu_count() or 1
+    _sections, keys = list(sections), list(codes)
+    batches = [(_sections[i::workers], [codes[key] for key in keys[i::workers]]) for i in range(workers)]
+    extensions = extender._exts
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        results = pool.map(_convert_static, [extensions] * workers, *zip(*batches))
+        count = 0
+        for i, (converted, highlighted) in enumerate(results):
+            for section, html in converted:
+                xmd_cache.put(sections[section], html)
+                count += 1
+            for key, html in zip(keys[i::workers], highlighted):
+                if html is not None:
+                    highlight_cache.put(key, html)
+                    count += 1
+    return count
+
+
+class _ParserPool:
+    """Pool of reusable `_ExtendedMarkdown` instances for the active extension set.
+    Building a Markdown parser loads all extensions, so instances are reset and reused instead.
+    A parser is taken out of pool while in use, so nested parsing (e.g. `write` inside a `python run` block) gets its own instance.
+    """
+    def __init__(self):
+        self._key = None # Extension set for which parsers in pool are built
+        self._free = []
+        self._constructed = 0
+        self._reused = 0
+    
+    def __repr__(self):
+        return f'ParserPool(free = {len(self._free)}, constructed = {self._constructed}, reused = {self._reused})'
+    
+    @property
+    def stats(self):
+        "Number of parsers constructed and reused since last `reset_stats`."
+        return {'constructed': self._constructed, 'reused': self._reused, 'free': len(self._free)}
+    
+    def reset_stats(self):
+        self._constructed, self._reused = 0, 0
+    
+    def clear(self):
+        "Drop all pooled parsers, called when extensions change."
+        self._key = None
+        self._free = []
+    
+    @contextmanager
+    def parser(self):
+        "Yields a parser from pool, and returns it back after reset."
+        key = frozenset(extender._all)
+        if key != self._key:
+            self.clear()
+            self._key = key
             
+        if self._free:
+            _parser = self._free.pop()
+            self._reused += 1
+        else:
+            _parser = _ExtendedMarkdown()
+            self._constructed += 1
+        
+        try:
+            yield _parser
+        finally:
+            _parser.reset()
+            if key == self._key: # Extensions may be changed while parsing
+                self._free.append(_parser)
+
+_parsers = _ParserPool()
 
 def parse_xmd(extended_markdown, display_inline = True, rich_outputs = False):
     """Parse extended markdown and display immediately. 
@@ -261,6 +782,14 @@ def parse_xmd(extended_markdown, display_inline = True, rich_outputs = False):
     **New in 1.7.5**
     Use `LiveSlides.extender` or `ipyslides.extended_md.extender` to add [markdown extensions](https://python-markdown.github.io/extensions/).
     """
-    return _ExtendedMarkdown().parse(extended_markdown, display_inline = display_inline, rich_outputs = rich_outputs)  
+    with _parsers.parser() as _parser:
+        return _parser.parse(extended_markdown, display_inline = display_inline, rich_outputs = rich_outputs)
+
+def _parse_slide_xmd(xmd):
+    """Parse and display markdown of a slide from `%%slide -m` or `from_markdown`, where cite`key`, notes`text`, citations`title`
+    and [key]:`value` are resolved by handlers registered by LiveSlides. Markdown written by python run blocks is not affected."""
+    with _parsers.parser() as _parser:
+        _parser._slide_syntax = True
+        return _parser.parse(xmd, display_inline = True, rich_outputs = False)  
     
     
\ No newline at end of file
@@ -3,13 +3,18 @@
 """
 import sys
 import textwrap
-import inspect, re, json
+import inspect, re, json, types, weakref, base64
+import itertools, uuid
+from contextlib import suppress
+from functools import lru_cache
 from io import BytesIO
 import pygments
 import ipywidgets as ipw
 from IPython.display import display, HTML 
 from IPython.core.display import __all__ as _all
-from IPython import get_ipython
+
+from ._cache import LRUCache, content_key
+from ._assets import asset_store
 
 __reprs__ = [rep.replace('display_','') for rep in _all if rep.startswith('display_')] # Can display these in write command
 class _HTML(HTML):
@@ -70,60 +75,355 @@ class _HTML_Widget(ipw.HTML):
         display(self)
 
 
-def plt2html(plt_fig = None,transparent=True,caption=None):
+def _artist_points(artist):
+    "Approximate number of points written to SVG for a Line2D, Collection or Patch."
+    if hasattr(artist, 'get_xydata'): # Line2D
+        return len(artist.get_xydata())
+    
+    if hasattr(artist, 'get_offsets'): # Scatter etc. draw one marker per offset
+        offsets = len(artist.get_offsets())
+        if offsets > 1:
+            return offsets
+    
+    paths = artist.get_paths() if hasattr(artist, 'get_paths') else [artist.get_path()]
+    return sum(len(path.vertices) for path in paths)
+
+def _minify_svg(svg, precision = 2):
+    "Remove metadata and whitespace between tags and round coordinates in path data of SVG text."
+    svg = re.sub(r'<metadata>.*?</metadata>', '', svg, flags = re.DOTALL)
+    svg = re.sub(r'>\s+<', '><', svg)
+    _round = lambda m: re.sub(r'(\d+\.\d{%d})\d+' % precision, r'\1', m.group(0))
+    return re.sub(r' d="[^"]*"', _round, svg)
+
+# Rendered HTML of matplotlib figures keyed on state of figure, disabled by default. Use `figure_cache.set_budget(nbytes)` to enable.
+figure_cache = LRUCache('Matplotlib Figures', max_bytes = 0)
+
+_figure_getters = ('get_xydata', 'get_offsets', 'get_array', 'get_paths', 'get_path', 'get_facecolor', 'get_edgecolor', 'get_color',
+    'get_linewidth', 'get_linestyle', 'get_marker', 'get_markersize', 'get_sizes', 'get_hatch', 'get_alpha', 'get_visible', 'get_zorder',
+    'get_text', 'get_position', 'get_fontsize', 'get_fontfamily', 'get_rotation', 'get_ha', 'get_va', 'get_label', 'get_extent', 
+    'get_cmap', 'get_clim', 'get_xlim', 'get_ylim', 'get_xscale', 'get_yscale', 'get_rasterized', 'get_size_inches', 'get_dpi')
+
+def _state_parts(value):
+    "Yields bytes/str parts of a value for hashing, arrays are hashed through their buffers."
+    if hasattr(value, 'vertices') and hasattr(value, 'codes'): # Path
+        yield from _state_parts(value.vertices)
+        yield from _state_parts(value.codes)
+    elif hasattr(value, 'bounds') and hasattr(value, 'get_points'): # Bbox
+        yield repr(value.bounds)
+    elif hasattr(value, 'tobytes') and hasattr(value, 'dtype'): # numpy array, masked values are included as well
+        mask = getattr(value, 'mask', None)
+        yield f'{value.dtype}{value.shape}'
+        yield value.tobytes()
+        if mask is not None and getattr(mask, 'shape', ()) == value.shape:
+            yield mask.tobytes()
+    elif isinstance(value, (list, tuple)):
+        yield f'{type(value).__name__}{len(value)}'
+        for v in value:
+            yield from _state_parts(v)
+    elif isinstance(value, dict):
+        yield f'dict{len(value)}'
+        for k, v in sorted(value.items(), key = lambda kv: str(kv[0])):
+            yield str(k)
+            yield from _state_parts(v)
+    elif hasattr(value, 'name') and hasattr(value, 'N'): # Colormap
+        yield value.name
+    elif hasattr(value, '__code__'): # Functions of FuncFormatter etc., repr has an address which changes on each run
+        yield value.__qualname__
+        yield value.__code__.co_code
+        yield repr(value.__code__.co_consts)
+        for cell in (value.__closure__ or ()):
+            with suppress(ValueError): # Empty cell
+                yield from _state_parts(cell.cell_contents)
+    else:
+        yield repr(value)
+
+def _figure_key(fig, *args):
+    "Stable hash of artists, their data and rcParams of a figure, along with extra arguments."
+    import matplotlib.axis # Also imports matplotlib
+    parts = [repr(sorted(matplotlib.rcParams.items())), *map(repr, args)]
+    for artist in fig.findobj():
+        parts.append(type(artist).__name__)
+        for getter in _figure_getters:
+            func = getattr(artist, getter, None)
+            if func is not None:
+                with suppress(Exception): # Some getters need arguments or renderer for some artists
+                    parts.extend(_state_parts(func()))
+        if isinstance(artist, matplotlib.axis.Axis): # Tick labels are only made at draw, so hash what makes them
+            parts.extend(_axis_parts(artist))
+    return content_key(*parts)
+
+def _axis_parts(axis):
+    "Yields parts of formatters and locators of major and minor ticks of an axis, along with tick settings."
+    for which in ('major', 'minor'):
+        ticker = getattr(axis, which)
+        for obj in (ticker.formatter, ticker.locator):
+            yield type(obj).__qualname__
+            yield from _state_parts({k: v for k, v in vars(obj).items() if k != 'axis'}) # axis refers back
+        yield from _state_parts(getattr(axis, f'_{which}_tick_kw', {}))
+
+def plt2html(plt_fig = None,transparent=True,caption=None, mode = 'auto', max_points = 20000, dpi = 150):
     """Write matplotib figure as HTML string to use in `ipyslide.utils.write`.
     **Parameters**
     
     - plt_fig    : Matplotlib's figure instance, auto picks as well.
     - transparent: True of False for fig background.
     - caption    : Caption for figure.
+    - mode       : 'svg' for minified SVG with text as text, 'png' for a PNG image at given `dpi`, 'auto' for SVG
+                   with heaviest artists rasterized at `dpi` until vector part has at most `max_points` points.
+    - max_points : Number of points (line vertices, scatter markers etc.) above which artists are rasterized in 'auto' mode.
+    - dpi        : Resolution for PNG or rasterized artists.
+    
+    Returned object has `info` attribute with format, points and bytes of output.
+    
+    If `figure_cache` is enabled by `figure_cache.set_budget(nbytes)`, output of a figure with same artists, data and rcParams
+    is reused instead of rendering again.
     """
+    if mode not in ('auto', 'svg', 'png'):
+        raise ValueError(f"mode should be one of 'auto', 'svg' or 'png', got {mode!r}")
+    
     # First line is to remove depedency on matplotlib if not used
     plt = sys.modules.get('matplotlib.pyplot', __import__('matplotlib.pyplot'))
     _fig = plt_fig or plt.gcf()
+    
+    key = _figure_key(_fig, transparent, caption, mode, max_points, dpi, asset_store.shared) if figure_cache.max_bytes else None
+    cached = figure_cache.get(key) if key else None
+    if cached is not None:
+        _fig.clf() # Same side effects as rendering
+        plt.close()
+        out = _HTML(cached[0])
+        out.info = dict(cached[1])
+        return out
+    
+    artists = _fig.findobj(lambda a: any(hasattr(a, f) for f in ('get_xydata', 'get_paths', 'get_path')))
+    points = {a: _artist_points(a) for a in artists}
+    info = {'format': mode, 'points': sum(points.values()), 'rasterized_points': 0}
+    
     plot_bytes = BytesIO()
-    _fig.savefig(plot_bytes,format='svg',transparent = transparent)
+    if mode == 'png':
+        _fig.savefig(plot_bytes,format='png',transparent = transparent, dpi = dpi)
+        src = base64.b64encode(plot_bytes.getvalue()).decode('utf-8')
+        html = asset_store.image(src, 'image/png') or f"<img src='data:image/png;base64,{src}' width='100%' height='auto'/>"
+    else:
+        heavy = []
+        if mode == 'auto' and info['points'] > max_points:
+            vector = info['points']
+            for artist in sorted(artists, key = points.get, reverse = True):
+                if vector <= max_points:
+                    break
+                if not artist.get_rasterized():
+                    heavy.append(artist)
+                    artist.set_rasterized(True)
+                    vector -= points[artist]
+            
+            info['format'] = 'svg+png' if heavy else 'svg'
+            info['rasterized_points'] = info['points'] - vector
+        elif mode == 'auto':
+            info['format'] = 'svg'
+        
+        try:
+            with plt.rc_context({'svg.fonttype': 'none'}): # Text as text, not glyph paths
+                _fig.savefig(plot_bytes,format='svg',transparent = transparent, dpi = dpi)
+        finally:
+            for artist in heavy:
+                artist.set_rasterized(False)
+        
+        html = _minify_svg('<svg' + plot_bytes.getvalue().decode('utf-8').split('<svg',1)[1])
+    
     _fig.clf() # Clear image to avoid other display
     plt.close() #AVoids throwing text outside figure
-    svg = '<svg' + plot_bytes.getvalue().decode('utf-8').split('<svg')[1]
+    info['nbytes'] = len(html)
     if caption:
-        svg = svg + f'<p style="font-size:80% !important;">{caption}</p>'
-    return _HTML(f"<div class='zoom-container'>{svg}</div>")
+        html = html + f'<p style="font-size:80% !important;">{caption}</p>'
+    out = _HTML(f"<div class='zoom-container'>{html}</div>")
+    out.info = info
+    if key:
+        figure_cache.put(key, (out.value, tuple(info.items())))
+    return out
 
 def _plt2htmlstr(plt_fig=None,transparent=True,caption=None):
     return plt2html(plt_fig=plt_fig,transparent=transparent,caption=caption).value
 
 
+# Scripts of chart libraries are loaded once per page (notebook or exported file) through a registry on window.
+# Each chart only carries its embed spec and this small loader, which does nothing if registry already exists.
+_runtime_loader = """window.ipyslidesRuntime = window.ipyslidesRuntime || (function() {
+    const promises = {};
+    let hidden = 0, amd;
+    function loadScript(src) {
+        if (!(src in promises)) {
+            promises[src] = new Promise((resolve, reject) => {
+                if (hidden++ === 0) { amd = window.define; window.define = undefined; } /* UMD bundles should attach to window, not requirejs */
+                const done = () => { if (--hidden === 0) { window.define = amd; } };
+                const script = document.createElement('script');
+                script.src = src;
+                script.onload = () => { done(); resolve(); };
+                script.onerror = () => { done(); reject(new Error('Failed to load ' + src)); };
+                document.head.appendChild(script);
+            });
+        }
+        return promises[src];
+    }
+    return {load: (srcs) => srcs.reduce((p, src) => p.then(() => loadScript(src)), Promise.resolve())};
+})();"""
+
+_chart_ids = itertools.count()
+_chart_prefix = uuid.uuid4().hex[:8] # Charts from different kernels in same page should not clash
+
+def _embed_chart(runtime, srcs, spec, embed, style = ''):
+    """Returns HTML of an empty div and a script which loads `srcs` once per page, then runs `embed` JS code 
+    with `el` (the div) and `spec` (JSON string of chart) defined."""
+    uid = f'chart-{runtime}-{_chart_prefix}-{next(_chart_ids)}'
+    spec = spec.replace('</', '<\\/') # Can't close script tag from inside
+    return f"""<div id="{uid}" class="chart-{runtime}" style="{style}"></div>
+<script type="text/javascript">
+{_runtime_loader}
+(function() {{
+    const el = document.getElementById("{uid}");
+    const spec = {spec};
+    window.ipyslidesRuntime.load({json.dumps(list(srcs))}).then(() => {{ {embed} }}).catch(e => {{ el.innerText = e.message; }});
+}})();
+</script>"""
+
 def bokeh2html(bokeh_fig,title=""):
-    """Write bokeh figure as HTML string to use in `ipyslide.utils.write`.
+    """Write bokeh figure as HTML string to use in `ipyslide.utils.write`. BokehJS is loaded once per notebook/exported file.
     **Parameters**
     
     - bokeh_fig : Bokeh figure instance.
-    - title     : Title for figure.
+    - title     : Not used anymore, kept for compatibility.
     """
     from bokeh.resources import CDN
-    from bokeh.embed import file_html
-    return _HTML(file_html(bokeh_fig, CDN, title))
+    from bokeh.embed import json_item
+    return _HTML(_embed_chart('bokeh', CDN.js_files, json.dumps(json_item(bokeh_fig)), 'Bokeh.embed.embed_item(spec, el.id);'))
 
 def _bokeh2htmlstr(bokeh_fig,title=""):
     return bokeh2html(bokeh_fig,title).value
 
+def _altair2htmlstr(chart):
+    import altair as alt
+    versions = [('vega', 'VEGA_VERSION', '5'), ('vega-lite', 'VEGALITE_VERSION', '5'), ('vega-embed', 'VEGAEMBED_VERSION', '6')]
+    srcs = [f'https://cdn.jsdelivr.net/npm/{name}@{getattr(alt, attr, default)}' for name, attr, default in versions]
+    return _embed_chart('altair', srcs, json.dumps(chart.to_dict()), 'vegaEmbed(el, spec);')
+
+def _pydeck2htmlstr(deck):
+    try:
+        from pydeck.frontend_semver import DECKGL_SEMVER
+    except ImportError: # Older versions, whole HTML document
+        return deck.to_html(as_string = True)
+    
+    srcs = [f'https://cdn.jsdelivr.net/npm/@deck.gl/jupyter-widget@{DECKGL_SEMVER}/dist/index.js']
+    tooltip = json.dumps(getattr(deck, '_tooltip', True))
+    return _embed_chart('pydeck', srcs, deck.to_json(), 
+        f'(window.createDeck || deck.createDeck)({{container: el, jsonInput: spec, tooltip: {tooltip}}});', style = 'height:500px;')
+
+def _plotly2htmlstr(fig):
+    from plotly.offline import get_plotlyjs_version
+    srcs = [f'https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js']
+    return _embed_chart('plotly', srcs, fig.to_json(), 'Plotly.newPlot(el, spec.data, spec.layout, {responsive: true});')
+
 def fix_ipy_image(image,width='100%'):
     img = image._repr_mimebundle_() # Picks PNG/JPEG/etc
-    _src,=[f'data:{k};base64, {v}' for k,v in img[0].items()]
-    return _HTML(f"<img src='{_src}' width='{width}' height='auto'/>") # width is important, height auto fixed
+    (mime, data), = img[0].items()
+    shared = asset_store.image(data, mime, width = width) # Same image is kept and sent once
+    if shared:
+        return _HTML(shared)
+    return _HTML(f"<img src='data:{mime};base64, {data}' width='{width}' height='auto'/>") # width is important, height auto fixed
 
 def _ipy_imagestr(image,width='100%'):
     return fix_ipy_image(image,width=width).value
 
+# Limits of pandas DataFrames written to slides, see `set_dataframe_options`
+_df_options = {'max_rows': 60, 'show_rows': 10, 'max_cols': 20, 'precision': None}
+
+def set_dataframe_options(max_rows = 60, show_rows = 10, max_cols = 20, precision = None):
+    """Set limits of pandas DataFrames written to slides. DataFrames longer than `max_rows` show `show_rows` rows from
+    head and tail each, so `show_rows` should be at most half of `max_rows`. DataFrames wider than `max_cols` show half of columns 
+    from each side. `precision` is maximum digits after decimal of floats, pandas option `display.precision` is used if None. 
+    Use `ipyslides.utils.paginate(df)` in `iwrite` to see all rows page by page."""
+    for key, value in dict(max_rows = max_rows, show_rows = show_rows, max_cols = max_cols, precision = precision).items():
+        if (value is not None or key != 'precision') and (not isinstance(value, int) or value < 0):
+            raise ValueError(f'{key} should be a non-negative integer, got {value!r}')
+    if 2 * show_rows > max_rows:
+        raise ValueError(f'show_rows should be at most max_rows // 2 = {max_rows // 2} to not repeat rows in head and tail, got {show_rows!r}')
+    _df_options.update(max_rows = max_rows, show_rows = show_rows, max_cols = max_cols, precision = precision)
+
+def _df_escape(text):
+    "Escape text of a DataFrame cell or header same as `to_html`."
+    return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _df_strings(values, precision = None):
+    "Formats visible part of a column (Series) or Index as escaped HTML strings in same way as pandas, including extension dtypes."
+    import numpy as np
+    from pandas.io.formats.format import format_array
+    plain = isinstance(values.dtype, np.dtype) and values.dtype.kind not in 'mM' # Dates and extension types need their arrays
+    values = values.to_numpy() if plain else values.array
+    return [_df_escape(s.strip()) for s in format_array(values, None, digits = precision, leading_space = False)]
+
+def _df2htmlstr(df, max_rows = None, max_cols = None):
+    """HTML table of a pandas DataFrame same as `df.to_html` with `max_rows` and `max_cols` from `set_dataframe_options` 
+    or given here. Only visible cells are formatted, so it is fast for large DataFrames."""
+    import numpy as np
+    opts = dict(_df_options, **{k: v for k, v in dict(max_rows = max_rows, max_cols = max_cols).items() if v is not None})
+    show = min(opts['show_rows'], opts['max_rows'] // 2) # max_rows given here can be less than 2 * show_rows
+    nrows, ncols = df.shape
+    row_cut = nrows > opts['max_rows']
+    col_cut = ncols > opts['max_cols']
+    
+    if df.index.nlevels > 1 or df.columns.nlevels > 1 or not nrows: # pandas handles hierarchical headers and empty frames
+        return df.to_html(max_rows = 2 * show if row_cut else None, max_cols = opts['max_cols'] if col_cut else None, show_dimensions = 'truncate')
+    
+    rows = np.r_[0:show, nrows - show:nrows] if row_cut else np.arange(nrows)
+    half = opts['max_cols'] // 2
+    cols = np.r_[0:half, ncols - half:ncols] if col_cut else np.arange(ncols)
+    
+    cells = [_df_strings(df.iloc[rows, c], opts['precision']) for c in cols]
+    names = _df_strings(df.columns[cols], opts['precision'])
+    if col_cut:
+        cells.insert(half, ['...'] * len(rows))
+        names.insert(half, '...')
+    
+    body = []
+    for i, index in enumerate(_df_strings(df.index[rows], opts['precision'])):
+        if row_cut and i == show:
+            body.append('    <tr>\n      <th>...</th>\n' + '      <td>...</td>\n' * len(cells) + '    </tr>')
+        body.append(f'    <tr>\n      <th>{index}</th>\n' + ''.join(f'      <td>{cell[i]}</td>\n' for cell in cells) + '    </tr>')
+    
+    corner = '' if df.columns.name is None else _df_escape(df.columns.name)
+    head = ''.join(f'      <th>{name}</th>\n' for name in names)
+    if df.index.name is not None: # Extra row for name of index, like pandas
+        head += '    </tr>\n    <tr>\n' + f'      <th>{_df_escape(df.index.name)}</th>\n' + '      <th></th>\n' * len(names)
+    shape = f'\n<p>{nrows} rows × {ncols} columns</p>' if row_cut or col_cut else ''
+    return ('<table border="1" class="dataframe">\n  <thead>\n    <tr style="text-align: right;">\n'
+        f'      <th>{corner}</th>\n{head}    </tr>\n  </thead>\n  <tbody>\n' + '\n'.join(body) + f'\n  </tbody>\n</table>{shape}')
+
+
+@lru_cache(maxsize = None)
+def _style_names():
+    "Frozen set of available pygments styles, scanning plugins is slow, so done once on first use."
+    return frozenset(pygments.styles.get_all_styles())
+
+def _check_style(style):
+    if style not in _style_names():
+        raise ValueError(f"Style {style!r} not found in {sorted(_style_names())}")
+
+@lru_cache(maxsize = 64)
+def _lexer(language):
+    "Cached lexer instance for a language, lexers do not keep state between highlights."
+    return pygments.lexers.get_lexer_by_name(language)
+
+@lru_cache(maxsize = 64)
+def _formatter(style):
+    return pygments.formatters.HtmlFormatter(style = style)
+
+@lru_cache(maxsize = 256)
+def _style_defs(style, _class):
+    return _formatter(style).get_style_defs(_class)
 
 def code_css(style='default',color = None, background = None, hover_color = 'var(--tr-hover-bg)', className = None, lineno = True):
     """Style code block with given style from pygments module. `color` and `background` are optional and will be overriden if pygments style provides them.
     """
-    if style not in pygments.styles.get_all_styles():
-        raise ValueError(f"Style {style!r} not found in {list(pygments.styles.get_all_styles())}")
+    _check_style(style)
     _class = '.highlight' if className is None else f'.highlight.{className}'
-    _style = pygments.formatters.HtmlFormatter(style = style).get_style_defs(_class)
+    _style = _style_defs(style, _class)
     if style == 'default':
         _bg_fg = {'background': 'var(--secondary-bg)', 'color': 'var(--primary-fg)'} # Should match inherit theme
     else: # Override color and background if provided by theme
@@ -160,21 +460,87 @@ def code_css(style='default',color = None, background = None, hover_color = 'var
         display:{'inline-block' if lineno else 'none'} !important;
     }}\n</style>"""
 
+class _CodeStyles:
+    "Registry of CSS for code blocks highlighted with a className. Each rule is kept once and emitted in a single stylesheet."
+    def __init__(self):
+        self._rules = {} # (style, color, background, hover_color, className, lineno) -> CSS
+        self._observers = [] # (callback, displayed)
+    
+    def __repr__(self):
+        return f'CodeStyles(classNames = {[k[4] for k in self._rules]})'
+    
+    def register(self, style = 'default', color = None, background = None, hover_color = 'var(--tr-hover-bg)', className = None, lineno = True):
+        "Register CSS of a code style for a className, see `code_css` for arguments. Later registration for a className overrides older one."
+        key = (style, color, background, hover_color, className, lineno)
+        if key in self._rules:
+            return
+        
+        for old in [k for k in self._rules if k[4] == className]: # Same className can have only one style
+            self._rules.pop(old)
+        
+        self._rules[key] = code_css(style = style, color = color, background = background, hover_color = hover_color, className = className, lineno = lineno)
+        for callback, _ in self._observers:
+            callback(self.css)
+    
+    def observe(self, callback, displayed = lambda: True):
+        """Call `callback(css)` whenever a new rule is registered. CSS is left out of code blocks only while `displayed()` 
+        of some observer returns True, otherwise each block carries its own CSS."""
+        self._observers.append((callback, displayed))
+    
+    @property
+    def shared(self):
+        "True if code blocks rely on a displayed view (LiveSlides) showing `css`."
+        return any(displayed() for _, displayed in self._observers)
+    
+    @property
+    def css(self):
+        "Single <style> block with all registered code styles."
+        return self.css_for()
+    
+    def css_for(self, content = None):
+        "Single <style> block with code styles used in given HTML content, or all if content is None."
+        rules = [rule.replace('<style>','').replace('</style>','') for key, rule in self._rules.items()
+            if content is None or f'class="highlight {key[4]}"' in content]
+        return f'<style>{"".join(rules)}</style>' if rules else ''
+
+code_styles = _CodeStyles()
+del _CodeStyles
+
+# Final HTML of highlighted code, keyed on code and all arguments of `highlight`
+highlight_cache = LRUCache('Highlighted Code', max_bytes = 16 * 2**20)
+
 def highlight(code, language='python', name = None, className = None, style='default', color = None, background = None, hover_color = 'var(--tr-hover-bg)', lineno = True):
     """Highlight code with given language and style. style only works if className is given.
     If className is given and matches any of pygments.styles.get_all_styles(), then style will be applied immediately.
     color is used for text color as some themes dont provide text color.
+    Output is cached, use `highlight_cache.stats` to see hits/misses.
     New in version 1.4.3"""
-    if style not in pygments.styles.get_all_styles():
-        raise ValueError(f"Style {style!r} not found in {list(pygments.styles.get_all_styles())}")
-    if className in pygments.styles.get_all_styles():
+    if className: # CSS is shared by all blocks with same className while slides are displayed
+        code_styles.register(style = className if className in _style_names() else style, color = color, 
+            background = background, hover_color = hover_color, className = className, lineno = lineno)
+    
+    args = _highlight_args(code, language, name, className, style, color, background, hover_color, lineno)
+    key = content_key(*args)
+    out = highlight_cache.get(key)
+    if out is None:
+        out = highlight_cache.put(key, _highlight(*args))
+    return _HTML(out) # New object each time, so changes to it are not shared
+
+def _highlight_args(code, language = 'python', name = None, className = None, style = 'default', color = None, background = None, hover_color = 'var(--tr-hover-bg)', lineno = True):
+    "Returns arguments of `_highlight` for arguments of `highlight`, `content_key` of which is key in `highlight_cache`."
+    embed = bool(className) and not code_styles.shared # No view to show shared CSS, block should carry it
+    return (code, language, name, className, style, color, background, hover_color, lineno, embed)
+
+def _highlight(code, language, name, className, style, color, background, hover_color, lineno, embed = False):
+    "Returns HTML string of highlighted code, see `highlight` for arguments. CSS of className is included if `embed` is True."
+    _check_style(style)
+    if className in _style_names():
         style = className
-        
-    formatter = pygments.formatters.HtmlFormatter(style = style)
-    _style = code_css(style=style, color = color, background = background, hover_color = hover_color,className=className, lineno = lineno) if className else ''
+    
+    _style = code_css(style=style, color = color, background = background, hover_color = hover_color,className=className, lineno = lineno) if embed else ''
     _code = pygments.highlight(textwrap.dedent(code), # dedent make sure code blocks at any level are picked as well
-                               pygments.lexers.get_lexer_by_name(language),
-                               formatter)
+                               _lexer(language),
+                               _formatter(style))
     
     start, mid_end = _code.split('<pre>')
     middle, end = mid_end.split('</pre>')
@@ -185,11 +551,14 @@ def highlight(code, language='python', name = None, className = None, style='def
     if isinstance(className, str):
         start = start.replace('class="highlight"',f'class="highlight {className}"')
     
-    return _HTML(f'''<div>
+    return f'''<div>
         <span class='lang-name'>{_title}</span>
         {_style}\n{start}
         <pre>{code_}
-        </pre>\n{end}</div>''')
+        </pre>\n{end}</div>'''
+
+# type -> (handler, names of _repr_*_ methods), resolved once per type. Cleared when serializers change.
+_handlers = weakref.WeakKeyDictionary()
     
 class Serializer:
     def __init__(self):
@@ -248,19 +617,20 @@ class Serializer:
                 self._libs.append(item)
                 if verbose:
                     print(f'Registered: {item["obj"]} → {item["func"].__name__}({item["obj"]})')
-                
+            
+            _handlers.clear() # Types may resolve to new serializer now
             return func
         return _register
     
     def unregister(self, obj_type):
         "Unregister all serializer handlers for a type."
-        for item in self._libs:
-            if obj_type is item['obj']:
-                self._libs.remove(item)
+        self._libs = [item for item in self._libs if obj_type is not item['obj']]
+        _handlers.clear()
     
     def unregisterall(self):
         "Unregister all serializer handlers. New in 1.6.8"
         self._libs = []
+        _handlers.clear()
     
     def __repr__(self):
         return 'Serializer(\n\t' + '\n\t'.join(f'{item["obj"]} → {item["func"].__name__}({item["obj"]})' for item in self._libs) + '\n)'
@@ -273,62 +643,85 @@ del Serializer # Make sure this is not used by user
 
 libraries = [
     {'name':'matplotlib.pyplot','obj':'Figure','func':_plt2htmlstr,'args':(),'kwargs': {}},
-    {'name':'altair','obj':'Chart','func': 'to_html','args':(),'kwargs': {}},
+    {'name':'altair','obj':'Chart','func': _altair2htmlstr,'args':(),'kwargs': {}},
     {'name':'pygal','obj':'Graph','func':'render','args':{},'kwargs':{'is_unicode':True}},
-    {'name':'pydeck','obj':'Deck','func':'to_html','args':(),'kwargs': {'as_string':True}},
-    {'name':'pandas','obj':'DataFrame','func':'to_html','args':(),'kwargs': {}},
+    {'name':'pydeck','obj':'Deck','func':_pydeck2htmlstr,'args':(),'kwargs': {}},
+    {'name':'plotly.graph_objects','obj':'Figure','func':_plotly2htmlstr,'args':(),'kwargs': {}},
+    {'name':'pandas','obj':'DataFrame','func':_df2htmlstr,'args':(),'kwargs': {}},
     {'name':'bokeh.plotting','obj':'Figure','func':_bokeh2htmlstr,'args':(),'kwargs':{'title':''}},
     {'name':'IPython.display','obj':'Image','func':_ipy_imagestr,'args':(),'kwargs':{'width':'100%'}}  
 ]
 
-def format_object(obj):
-    "Returns string of HTML for given object."
+def _source_html(obj):
+    try:
+        source = inspect.getsource(obj)
+        source = re.sub(r'^#\s+','#',source) # Avoid Headings in source
+        return highlight(source,language='python',style='default',className=None).value
+    except:
+        return f'Can not get source code of:\n{obj}'
+
+def _lib_type(lib, cls):
+    "Returns type of library entry from already imported modules, by name in MRO of `cls` if module is not imported yet."
+    _module = sys.modules.get(lib['name'], None)
+    if _module is not None:
+        return getattr(_module, lib['obj'], None)
+    
+    root = lib['name'].split('.')[0]
+    for base in cls.__mro__:
+        if base.__name__ == lib['obj'] and base.__module__.split('.')[0] == root:
+            return base
+
+def _lib_handler(lib):
+    if not isinstance(lib['func'],str): # Handle Matplotlib, bokeh, df etc here by making handling functions
+        return lambda obj: lib['func'](obj, *lib['args'],**lib['kwargs'])
+    return lambda obj: getattr(obj, lib['func'])(*lib['args'],**lib['kwargs'])
+
+def _resolve_handler(cls):
+    "Returns function to get HTML of objects of type `cls`, or None. Checks are same as on objects but done once per type."
     for _lib in serializer._libs:
-        if isinstance(obj, _lib['obj']):
-            return True, _lib['func'](obj)
+        if issubclass(cls, _lib['obj']):
+            return _lib['func']
     
     # If matplotlib axes given, handle it separately
-    if hasattr(obj,'get_figure'): 
-        return True,_plt2htmlstr(obj.get_figure())
+    if hasattr(cls,'get_figure'): 
+        return lambda obj: _plt2htmlstr(obj.get_figure())
     
     # Some builtin types
-    if isinstance(obj,dict):
-        return  True, f"<div class='PyRepr'>{json.dumps(obj,indent=4)}</div>"  
-    elif isinstance(obj,(int,float, bool)):
-        return True, str(obj)  
-    elif isinstance(obj,(set,list,tuple)): # Then prefer other builtins
-        return True, f"<div class='PyRepr'>{obj}</div>"
-    
-    # If Code object given
-    for _type in ['class','function','module','method','builtin','generator']:
-        if getattr(inspect,f'is{_type}')(obj):
-            try:
-                source = inspect.getsource(obj)
-                source = re.sub(r'^#\s+','#',source) # Avoid Headings in source
-                source = highlight(source,language='python',style='default',className=None).value
-            except:
-                source = f'Can not get source code of:\n{obj}'
-            
-            return (True, source)
+    if issubclass(cls,dict):
+        return lambda obj: f"<div class='PyRepr'>{json.dumps(obj,indent=4)}</div>"
+    elif issubclass(cls,(int,float, bool)):
+        return str
+    elif issubclass(cls,(set,list,tuple)): # Then prefer other builtins
+        return lambda obj: f"<div class='PyRepr'>{obj}</div>"
     
-    # Other Libraries   
-    module_name = obj.__module__ if hasattr(obj,'__module__') else '' #str, int etc don't have __module__
+    # If Code object given, same as inspect.isclass, isfunction, ismodule, ismethod, isbuiltin, isgenerator
+    if issubclass(cls, (type, types.FunctionType, types.ModuleType, types.MethodType, types.BuiltinFunctionType, types.GeneratorType)):
+        return _source_html
     
+    # Other Libraries, only already imported ones are checked, an object of library can't exist without it
+    module_name = getattr(cls,'__module__','') or ''
     for lib in libraries:
         if lib['name'].split('.')[0] in module_name: #MATCH NAMES
-            _module = sys.modules.get(lib['name'],None) # Already imported
-            
-            if not _module:
-                get_ipython().run_cell(f"import {lib['name']} as _module") # Need import to compare
-                
-            _obj = getattr(_module,lib['obj'],None)
-            if isinstance(obj, _obj):
-                if not isinstance(lib['func'],str): # Handle Matplotlib, bokeh, df etc here by making handling functions
-                    return True, lib['func'](obj, *lib['args'],**lib['kwargs'])
-                else:
-                    _func = getattr(obj, lib['func'],None)
-                    if _func:
-                        return True, _func(*lib['args'],**lib['kwargs'])
+            _obj = _lib_type(lib, cls)
+            if isinstance(_obj, type) and issubclass(cls, _obj):
+                if not isinstance(lib['func'],str) or hasattr(cls, lib['func']):
+                    return _lib_handler(lib)
+
+def _dispatch(cls):
+    "Returns (handler, names of _repr_*_ methods) for type `cls`, cached per type."
+    try:
+        return _handlers[cls]
+    except (KeyError, TypeError): # TypeError if type can't be weak referenced
+        out = (_resolve_handler(cls), tuple(r for r in __reprs__ if hasattr(cls, f'_repr_{r}_')))
+        with suppress(TypeError):
+            _handlers[cls] = out
+        return out
+
+def format_object(obj):
+    "Returns string of HTML for given object."
+    handler, _ = _dispatch(type(obj))
+    if handler is not None:
+        return True, handler(obj)
 
     # If Nothing found
     return False, NotImplementedError(f"{obj}'s html representation is not implemented yet!")       
@@ -348,9 +741,8 @@ def stringify(obj):
             return _html # it is a string
         
         # Ipython objects
-        _reprs_ = [rep for rep in [getattr(obj,f'_repr_{r}_',None) for r in __reprs__] if rep]   
-        for _rep_ in _reprs_:
-            _out_ = _rep_()
+        for r in _dispatch(type(obj))[1]:
+            _out_ = getattr(obj, f'_repr_{r}_')()
             if _out_: # If there is object in _repr_<>_, don't return None
                 return _out_
         
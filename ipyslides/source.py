@@ -1,24 +1,50 @@
 """
 Display source code from files/context managers.
 """
-import ast, re, os
+import ast, re, os, mmap
 import sys, linecache
 import textwrap
 import inspect
-import pygments
 
 from contextlib import contextmanager, suppress
+from functools import lru_cache
 from IPython.display import display
 
-from .formatter import highlight, _HTML
+from .formatter import highlight, _HTML, _lexer
     
 
+def _split_lines(html):
+    "Split highlighted HTML into (header, tuple of line fragments inside <code>, footer)."
+    head, *middle = html.split('<code>')
+    if not middle:
+        return html, (), ''
+    
+    middle[-1], tail = middle[-1].rsplit('</code>', 1)
+    lines = tuple(line.rsplit('</code>', 1)[0] for line in middle[:-1]) + (middle[-1],)
+    return head, lines, tail
+
 # Do not use this in main work, just inside a function
 class _Source(_HTML):
-    "Returns the source code of the object as HTML."
+    """Returns the source code of the object as HTML. Lines are kept as a tuple of fragments between a shared header and footer,
+    so `show_lines` and `focus_lines` return views over same fragments and HTML is joined only when displayed."""
     def __init__(self, *args, **kwargs):
+        self._parts = None # (header, lines, footer), shared by derived views
+        self._rows = None # Indices of lines in view or str for skipped lines, None for all lines
+        self._focus = None # Rows to focus in view, None for no focus
         super().__init__(*args, **kwargs)
         self._raw = ''
+    
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._render()
+        return self._data
+    
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._parts, self._rows, self._focus = None, None, None
+    
     @property
     def raw(self):
         "Return raw source code."
@@ -29,6 +55,35 @@ class _Source(_HTML):
         "Set raw source code."
         self._raw = value
     
+    def _get_parts(self):
+        if self._parts is None:
+            self._parts = _split_lines(self._data)
+        return self._parts
+    
+    def _view(self, rows, focus):
+        "Returns a new source object sharing line fragments with this one."
+        out = self.__class__.__new__(self.__class__)
+        out._data, out._parts, out._rows, out._focus = None, self._get_parts(), rows, focus
+        out.url, out.filename, out.metadata = None, None, {}
+        out._raw = self._raw
+        return out
+    
+    def _render(self):
+        head, lines, tail = self._parts
+        rows = range(len(lines)) if self._rows is None else self._rows
+        
+        codes = []
+        for i, row in enumerate(rows):
+            if isinstance(row, str): # No newline after skipped lines
+                codes.append(f'<code class="code-no-focus"> + {row} more lines ... </code>')
+            elif self._focus is None:
+                codes.append(f'<code>{lines[row]}</code>\n')
+            else:
+                codes.append(f'<code class="{"code-focus" if i in self._focus else "code-no-focus"}">{lines[row]}</code>\n')
+        
+        codes = ''.join(codes)
+        return head + (codes[:-1] if codes.endswith('\n') else codes) + tail
+    
     def display(self,collapsed = False):
         "Display source object in IPython notebook."
         if collapsed:
@@ -44,38 +99,31 @@ class _Source(_HTML):
         if not isinstance(lines,(list,tuple,range)):
             raise TypeError(f'lines must be list, tuple or range, not {type(lines)}')
         
-        start, *middle = self.value.split('<code>')
-        middle[-1], end = middle[-1].split('</code>')
-        middle[-1] += '</code>'
-        _max_index = len(middle) - 1
+        _, _lines, _ = self._get_parts()
+        rows = range(len(_lines)) if self._rows is None else self._rows
+        _max_index = len(rows) - 1
         
-        new_lines = [start]
+        new_rows, focus = [], set()
         picks = [-1,*sorted(lines)]
         for a, b in zip(picks[:-1],picks[1:]):
             if b - a > 1: # Not consecutive lines
-                new_lines.append(f'<code class="code-no-focus"> + {b - a - 1} more lines ... </code>')
-            new_lines.append('<code>' + middle[b])
+                new_rows.append(str(b - a - 1))
+            if self._focus is not None and b in self._focus:
+                focus.add(len(new_rows))
+            new_rows.append(rows[b])
         
-        if lines and lines[-1] < _max_index:
-            new_lines.append(f'<code class="code-no-focus"> + {_max_index - lines[-1]} more lines ... </code>')
+        if lines and picks[-1] < _max_index:
+            new_rows.append(str(_max_index - picks[-1]))
         
-        return self.__class__(''.join([*new_lines, end]))     
+        return self._view(tuple(new_rows), None if self._focus is None else frozenset(focus))
     
     def focus_lines(self, lines):
         "Return source object with focus on given list/tuple/range of lines."
         if not isinstance(lines,(list,tuple,range)):
             raise TypeError(f'lines must be list, tuple or range, not {type(lines)}')
         
-        _lines = []
-        for i, line in enumerate(self.value.split('<code>'), start = -1):
-            if i == -1:
-                _lines.append(line) # start things
-            elif i not in lines:
-                _lines.append('<code class="code-no-focus">' + line)
-            else:
-                _lines.append('<code class="code-focus">' + line)
-        
-        return self.__class__(''.join(_lines))
+        self._get_parts() # make sure parts exist before sharing
+        return self._view(self._rows, frozenset(lines))
 
 def _file2code(filename,language='python',name=None,**kwargs):
     "Only reads plain text or StringIO, return source object with `show_lines` and `focus_lines` methods."
@@ -94,6 +142,128 @@ def _str2code(text,language='python',name=None,**kwargs):
     out.raw = text
     return out
 
+_triple_re = re.compile(rb'\"\"\"|\'\'\'')
+
+def _next_quote(mm, pos, size):
+    "Returns (start, end, quote) of next triple quote in memory map from pos, or None. Match is not kept as it holds memory map open."
+    match = _triple_re.search(mm, pos, size)
+    return (match.start(), match.end(), match.group(0)) if match else None
+
+def _read_lines(filename, start, stop, python = False):
+    """Returns (text of lines[top:stop], top, total number of lines) of a file, where top is last line at or before `start`
+    without indentation (outside triple quoted strings if `python`), else 0. Lines and quotes are found in a single pass 
+    through a memory map instead of reading whole file. Blank lines at end of file are not counted, as lexer strips them."""
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return '', 0, 0
+        
+        with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            while size and mm[size - 1:size].isspace():
+                size -= 1
+            
+            match = _next_quote(mm, 0, size) if python else None
+            quote = None # Triple quote of string open at start of line
+            pos, line, top, a = 0, 0, 0, 0
+            while line < stop and pos < size:
+                if line <= start:
+                    while match is not None and match[0] < pos: # Quotes inside other strings or comments are not considered
+                        if quote is None:
+                            quote = match[2]
+                        elif match[2] == quote:
+                            quote = None
+                        match = _next_quote(mm, match[1], size)
+                    
+                    if quote is None and not mm[pos:pos + 1].isspace():
+                        top, a = line, pos
+                end = mm.find(b'\n', pos, size)
+                pos = size if end == -1 else end + 1
+                line += 1
+            
+            text = mm[a:pos].decode('utf-8') if line > top else ''
+            if pos < size:
+                line += 1 # Last line has no newline after stripping
+                for i in range(pos, size, 2**20): # Count remaining lines in chunks
+                    line += mm[i:min(i + 2**20, size)].count(b'\n')
+            return text, top, line
+
+def _file2code_lines(filename, lines, language = 'python', name = None, context = 100, **kwargs):
+    """Highlights only lines from first to last of given `lines` of a file, with `context` lines around them for lexer state,
+    and returns source object equivalent to `show_lines(lines)` of whole file. Lexing starts at a line without indentation 
+    (a top level statement) at least `context` lines before, so indentation is kept as in file. For python, lines inside 
+    triple quoted strings are not taken as start, for other languages lines inside a string or comment which opens before 
+    start may be highlighted differently than in whole file."""
+    if not isinstance(lines,(list,tuple,range)):
+        raise TypeError(f'lines must be list, tuple or range, not {type(lines)}')
+    
+    picks = sorted(lines)
+    if not picks:
+        raise ValueError('lines should not be empty!')
+    
+    first, last = picks[0], picks[-1]
+    is_python = 'python' in _lexer(language).aliases
+    text, start, total = _read_lines(filename, max(0, first - context), last + 1 + context, python = is_python) # Start at top level line, as highlight dedents code
+    if first < 0 or last >= total:
+        raise IndexError(f'lines should be in range(0, {total}) for file {filename!r}, got {first} to {last}')
+    
+    _lines = [line.rstrip('\r') for line in text.split('\n')]
+    before, window, after = _lines[:first - start], _lines[first - start:last + 1 - start], _lines[last + 1 - start:]
+    while before and not before[0].strip(): # Lexer strips blank lines at ends, keep count of them to add back
+        before.pop(0)
+    
+    lead = 0
+    while not before and lead < len(window) and not window[lead].strip():
+        lead += 1
+    
+    code = '\n'.join([*before, *window[lead:], *after])
+    head, frags, tail = _split_lines(highlight(code, language = language, name = name, **kwargs).value) if code.strip() else ('', (), '')
+    frags = (('',) * lead + frags[len(before):])[:len(window)]
+    frags += ('',) * (len(window) - len(frags))
+    
+    rows = []
+    for a, b in zip([-1, *picks[:-1]], picks):
+        if b - a > 1: # Not consecutive lines
+            rows.append(str(b - a - 1))
+        rows.append(b - first)
+    
+    if last < total - 1:
+        rows.append(str(total - 1 - last))
+    
+    out = _Source(head + tail)
+    out._parts, out._rows, out._data = (head, frags, tail), tuple(rows), None
+    out.raw = '\n'.join(window)
+    return out
+
+@lru_cache(maxsize = 32)
+def _with_index(filename, size, mtime):
+    """Returns {line of with statement: last line of its body} for all `with` blocks in a file or cell,
+    which is parsed once per (filename, size, mtime) as given by linecache. Cells have unique names per code."""
+    try:
+        tree = ast.parse(''.join(linecache.getlines(filename)))
+    except (SyntaxError, ValueError):
+        return {}
+    
+    return {node.lineno: getattr(node.body[-1], 'end_lineno', node.body[-1].lineno) # end_lineno in Python 3.8+
+        for node in ast.walk(tree) if isinstance(node, ast.With)}
+
+def _with_end(lines, n1):
+    "Returns last line of body of `with` statement at line n1 by parsing from its top level statement."
+    offset = 0 # going back to zero indent level
+    while re.match('^\t?^\s+', lines[n1 - offset]): 
+         offset = offset + 1
+         
+    _source = ''.join(lines[n1 - offset:])
+    tree = ast.parse(_source)
+    with_node = tree.body[0] # Could be itself at top level
+    
+    for node in ast.walk(tree):
+        if isinstance(node, ast.With) and node.lineno == offset: # that much gone up, so back same
+            with_node = node
+            break
+    
+    # multiline expressions can't be handled for < 3.8, just first line picked
+    return n1 - offset + getattr(with_node.body[-1], 'end_lineno', with_node.body[-1].lineno)
+
 class Source:
     current = None
     def __init__(self):
@@ -111,11 +281,17 @@ class Source:
         return cls.current
     
     @classmethod
-    def from_file(cls, filename,language = None,name = None,**kwargs):
+    def from_file(cls, filename,language = None,name = None, lines = None, **kwargs):
         """Returns source object with `show_lines` and `focus_lines` methods. `name` is alternate used name for language.  
         `kwargs` are passed to `ipyslides.formatter.highlight`.     
         
         (1.6.8+) tries to auto detect lanaguage from filename extension, if `language` is not given.
+        
+        If `lines` (list/tuple/range) is given, result is like `from_file(filename).show_lines(lines)`, but only those lines
+        (with some lines around them for highlighting) are read from file and highlighted, which is fast for large files.
+        Here `lines` are counted from first line of file, even if it is blank. Highlighting starts at a line without indentation 
+        about 100 lines before (outside triple quoted strings for python), so for other languages lines inside a long string 
+        or comment opened before that may be colored differently.
         """
         _title = name or filename
         _lang = language or os.path.splitext(filename)[-1].replace('.','')
@@ -123,12 +299,15 @@ class Source:
         if language is None:
             lexer = None
             with suppress(BaseException):
-                lexer = pygments.lexers.get_lexer_by_name(_lang)
+                lexer = _lexer(_lang)
                 
             if lexer is None:
                 raise Exception(f'Failed to detect language from file {filename!r}. Use language argument!')
             
-        cls.current = _file2code(filename,language = _lang,name = _title,**kwargs)
+        if lines is not None:
+            cls.current = _file2code_lines(filename, lines, language = _lang, name = _title, **kwargs)
+        else:
+            cls.current = _file2code(filename,language = _lang,name = _title,**kwargs)
         return cls.current
     
     @classmethod       
@@ -157,26 +336,13 @@ class Source:
         ```
         """  
         frame = sys._getframe().f_back.f_back # go two steps back
-        lines, n1 = linecache.getlines(frame.f_code.co_filename), frame.f_lineno
-        offset = 0 # going back to zero indent level
-        while re.match('^\t?^\s+', lines[n1 - offset]): 
-             offset = offset + 1
-             
-        _source = ''.join(lines[n1 - offset:])
-        tree = ast.parse(_source)
-        with_node = tree.body[0] # Could be itself at top level
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.With) and node.lineno == offset: # that much gone up, so back same
-                with_node = node
-                break
-
-        if (sys.version_info.major >= 3) and (sys.version_info.minor >= 8):
-            n2 = with_node.body[-1].end_lineno #can include multiline expression
-        else: # if no next sibling node, pick by brute force for < 3.8
-            n2 = with_node.body[-1].lineno # multiline expressions can't be handled, just first line picked
+        filename, n1 = frame.f_code.co_filename, frame.f_lineno
+        lines = linecache.getlines(filename)
+        n2 = _with_index(filename, *linecache.cache.get(filename, (None, None))[:2]).get(n1)
+        if n2 is None: # Not found in parsed file/cell, search from top level statement
+            n2 = _with_end(lines, n1)
         
-        source = textwrap.dedent(''.join(lines[n1:][:n2 - offset]))
+        source = textwrap.dedent(''.join(lines[n1:n2]))
         source_html = _Source(highlight(source,language = 'python', **kwargs).value)
         source_html.raw = source # raw source code
         cls.current = source_html
@@ -1,6 +1,6 @@
 __all__ = ['capture_std', 'details', 'set_dir', 'textbox', 'vspace', 'center',
             'image','svg','iframe', 'format_html','format_css','alert','colored','keep_format',
-            'raw','enable_zoom','html','sig','doc','code']
+            'raw','enable_zoom','html','sig','doc','code','paginate']
 __all__.extend(['rows','cols','block'])
 __all__.extend([f'block_{c}' for c in 'rgbycma'])
 
@@ -15,7 +15,9 @@ from IPython.utils.capture import capture_output
 from IPython.core.display import Image
 import ipywidgets as ipw
 
-from .formatter import fix_ipy_image, _HTML
+from .formatter import fix_ipy_image, _HTML, _df2htmlstr
+from ._assets import asset_store, _image_size
+from ._cache import LRUCache, content_key
 from .writers import _fmt_write, _fix_repr
  
 class CapturedStd:
@@ -93,7 +95,49 @@ def __check_pil_image(data):
         return im_bytes.getvalue()
     return data # if not return back data
 
-def image(data=None,width='80%',caption=None, zoomable=True,**kwargs):
+# Images resampled to their display size, keyed on (source hash, target width, format)
+image_cache = LRUCache('Resized Images', max_bytes = 64 * 2**20)
+_screen_px = 1920 # Reference width of screen in CSS pixels, size of slides is estimated from it in kernel
+_content_px = lambda: 0.9 * _screen_px # Width of slide content in CSS pixels, provided by LiveSlides settings
+
+def _target_px(width, resize, zoomable, dpr):
+    "Width in device pixels an image is shown at, None if it can't be known from `width`."
+    if zoomable: # Zoomed image takes almost whole window
+        return int(_screen_px * dpr)
+    
+    area = _content_px() if resize is True else resize
+    if width.endswith('%'):
+        return int(float(width[:-1]) / 100 * area * dpr)
+    elif width.endswith('px'):
+        return int(float(width[:-2]) * dpr)
+
+def _resize_image(img, target_px):
+    "Returns IPython Image resampled to `target_px` width if it is wider, else given image. Needs PIL."
+    data = img.data
+    if not isinstance(data, bytes) or not target_px or img.format not in ('png', 'jpeg', 'webp'): # GIF may be animated
+        return img
+    
+    size = _image_size(data)
+    if not size or size[0] <= target_px:
+        return img
+    
+    key = content_key(data, target_px, img.format)
+    out = image_cache.get(key)
+    if out is None:
+        try:
+            from PIL import Image as PILImage
+        except ImportError:
+            return img
+        
+        with PILImage.open(BytesIO(data)) as im:
+            im = im.resize((target_px, max(1, round(im.height * target_px / im.width))), PILImage.LANCZOS)
+            im_bytes = BytesIO()
+            im.save(im_bytes, img.format.upper(), quality = 90)
+        out = image_cache.put(key, im_bytes.getvalue())
+    
+    return Image(data = out, format = img.format)
+
+def image(data=None,width='80%',caption=None, zoomable=True, resize = False, dpr = 2, **kwargs):
     """Displays PNG/JPEG files or image data etc, `kwrags` are passed to IPython.display.Image. 
     You can provide following to `data` parameter:
         
@@ -101,26 +145,64 @@ def image(data=None,width='80%',caption=None, zoomable=True,**kwargs):
     - A file path to image file.
     - A url to image file.
     - A str/bytes object containing image data.  
+    
+    If `resize` is True (slide content width) or width in pixels of area image is shown in, image bigger than its
+    display size times `dpr` (device pixel ratio) is resampled down with PIL. Zoomable images are kept big enough 
+    to fill screen on zoom. Resized images are cached in `utils.image_cache`.
     """
     if isinstance(width,int):
         width = f'{width}px'
     _data = __check_pil_image(data) #Check if data is a PIL Image or return data
-    img = fix_ipy_image(Image(data = _data,**kwargs),width=width) # gievs _HTML object
+    _image = Image(data = _data,**kwargs)
+    if resize:
+        _image = _resize_image(_image, _target_px(width, resize, zoomable, dpr))
+    img = fix_ipy_image(_image,width=width) # gievs _HTML object
     cap = f'<figcaption>{caption}</figcaption>' if caption else ''
     img = html('figure', img.value + cap)  # Add caption,  _HTML + _HTML
     if zoomable:
         return _HTML(f'<div class="zoom-container">{img}</div>')
-    return _HTML(img)
+    return img # already _HTML
 
 def svg(data=None,caption=None,zoomable=True,**kwargs):
     "Display svg file or svg string/bytes with additional customizations. `kwrags` are passed to IPython.display.SVG. You can provide url/string/bytes/filepath for svg."
     svg = SVG(data=data, **kwargs)._repr_svg_()
+    svg = asset_store.svg(svg) or svg # Same svg is kept and sent once
     cap = f'<figcaption>{caption}</figcaption>' if caption else ''
     svg = html('figure', svg + cap)
     if zoomable:
         return _HTML(f'<div class="zoom-container">{svg}</div>')
     return _HTML(svg)
 
+def paginate(df, page_size = 20):
+    """Returns a widget to show a pandas DataFrame page by page, only rows of current page are formatted when it is shown. 
+    Use it in `iwrite` for DataFrames too long for `write`, which shows only head and tail.
+    
+    ```python
+    writer, pages = iwrite(paginate(df, page_size = 20))
+    ```
+    """
+    if not isinstance(page_size, int) or page_size < 1:
+        raise ValueError(f'page_size should be a positive integer, got {page_size!r}')
+    
+    table = ipw.HTML()
+    label = ipw.Label()
+    prev = ipw.Button(icon='chevron-left',layout= ipw.Layout(width='auto',height='auto'))
+    next = ipw.Button(icon='chevron-right',layout= ipw.Layout(width='auto',height='auto'))
+    npages = max(1, -(-len(df) // page_size))
+    current = [0]
+    
+    def show(page):
+        current[0] = min(max(page, 0), npages - 1)
+        start = current[0] * page_size
+        table.value = _df2htmlstr(df.iloc[start:start + page_size], max_rows = page_size)
+        label.value = f'Rows {start + 1 if len(df) else 0}-{min(start + page_size, len(df))} of {len(df)} | Page {current[0] + 1}/{npages}'
+        prev.disabled, next.disabled = current[0] == 0, current[0] == npages - 1
+    
+    prev.on_click(lambda btn: show(current[0] - 1))
+    next.on_click(lambda btn: show(current[0] + 1))
+    show(0)
+    return ipw.VBox([table, ipw.HBox([prev, label, next])]).add_class('DataFramePages')
+
 def iframe(src, width='100%',height='auto',**kwargs):
     "Display `src` in an `iframe`. `kwrags` are passed to IPython.display.IFrame"
     f = IFrame(src,width,height, **kwargs)
@@ -0,0 +1,34 @@
+import matplotlib
+matplotlib.use('agg')
+import matplotlib.pyplot as plt
+from matplotlib.ticker import PercentFormatter, FuncFormatter
+
+from ipyslides.formatter import plt2html, figure_cache, _figure_key
+
+
+def _figure(formatter = None):
+    fig, ax = plt.subplots()
+    ax.plot([0, 0.5, 1])
+    if formatter is not None:
+        ax.yaxis.set_major_formatter(formatter)
+    return fig
+
+def test_key_changes_with_tick_formatter():
+    assert _figure_key(_figure()) != _figure_key(_figure(PercentFormatter()))
+    assert _figure_key(_figure(PercentFormatter(1))) != _figure_key(_figure(PercentFormatter(100)))
+    assert _figure_key(_figure(PercentFormatter())) == _figure_key(_figure(PercentFormatter()))
+
+def test_key_is_stable_for_same_function_formatter():
+    make = lambda: FuncFormatter(lambda x, pos: f'{x:.1f} m')
+    assert _figure_key(_figure(make())) == _figure_key(_figure(make()))
+    assert _figure_key(_figure(make())) != _figure_key(_figure(FuncFormatter(lambda x, pos: f'{x:.2f} m')))
+
+def test_cached_output_differs_by_tick_formatter():
+    figure_cache.set_budget(2**24)
+    try:
+        plain = plt2html(_figure(), mode = 'svg').value
+        percent = plt2html(_figure(PercentFormatter()), mode = 'svg').value
+        assert plain != percent
+        assert '%' in percent and '%' not in plain
+    finally:
+        figure_cache.set_budget(0)